@@ -0,0 +1,256 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+In-process stand-ins for the ``ibm_db`` and ``ibm_db_dbi`` modules.
+
+They implement just enough of the driver for the backend to connect, run
+statements and fetch rows without a DB2 server, so the benchmarks measure
+the work done by ibm_db_django itself. ``install()`` has to run before
+``ibm_db_django`` is imported. Statements return the rows of the callable
+set with ``set_results``, called with the operation and its parameters and
+returning a ``(description, rows)`` pair or None.
+"""
+
+import sys
+import types
+
+_results = None
+
+
+def set_results(results):
+    global _results
+    _results = results
+
+
+def _noop(*args, **kwargs):
+    return True
+
+
+class _Statement(object):
+
+    def __init__(self, operation, options=None):
+        self.operation = operation
+        self.options = options
+
+
+def _build_ibm_db():
+    ibm_db = types.ModuleType('ibm_db')
+    ibm_db.SQL_ATTR_AUTOCOMMIT = 102
+    ibm_db.SQL_AUTOCOMMIT_OFF = 0
+    ibm_db.SQL_AUTOCOMMIT_ON = 1
+    ibm_db.SQL_ATTR_CURSOR_TYPE = 6
+    ibm_db.SQL_CURSOR_FORWARD_ONLY = 0
+    ibm_db.SQL_CURSOR_KEYSET_DRIVEN = 1
+    ibm_db.SQL_ATTR_QUERY_PREFETCH = 2592
+    ibm_db.SQL_ATTR_FET_BUF_SIZE = 3001
+    ibm_db.prepare = lambda conn_handler, operation, options=None: _Statement(operation, options)
+    ibm_db.execute_many = lambda stmt_handler, seq_parameters: len(seq_parameters)
+    ibm_db.free_stmt = _noop
+    ibm_db.free_result = _noop
+    ibm_db.active = _noop
+    ibm_db.autocommit = lambda conn_handler, value=None: 1
+    return ibm_db
+
+
+def _build_ibm_db_dbi(ibm_db):
+    dbi = types.ModuleType('ibm_db_dbi')
+    dbi.ibm_db = ibm_db
+    dbi.apilevel = '2.0'
+    dbi.threadsafety = 0
+    dbi.paramstyle = 'qmark'
+
+    class Warning(Exception):
+        pass
+
+    class Error(Exception):
+        pass
+
+    class InterfaceError(Error):
+        pass
+
+    class DatabaseError(Error):
+        pass
+
+    class InternalError(DatabaseError):
+        pass
+
+    class OperationalError(DatabaseError):
+        pass
+
+    class ProgrammingError(DatabaseError):
+        pass
+
+    class IntegrityError(DatabaseError):
+        pass
+
+    class DataError(DatabaseError):
+        pass
+
+    class NotSupportedError(DatabaseError):
+        pass
+
+    for exception in (Warning, Error, InterfaceError, DatabaseError, InternalError, OperationalError,
+                      ProgrammingError, IntegrityError, DataError, NotSupportedError):
+        exception.__module__ = 'ibm_db_dbi'
+        setattr(dbi, exception.__name__, exception)
+    dbi._get_exception = lambda inst: inst
+
+    class DBAPITypeObject(frozenset):
+        pass
+
+    dbi.DBAPITypeObject = DBAPITypeObject
+    dbi.STRING = DBAPITypeObject(('CHARACTER', 'CHAR', 'VARCHAR'))
+    dbi.TEXT = DBAPITypeObject(('CLOB',))
+    dbi.XML = DBAPITypeObject(('XML',))
+    dbi.BINARY = DBAPITypeObject(('BLOB',))
+    dbi.NUMBER = DBAPITypeObject(('INTEGER', 'INT', 'SMALLINT'))
+    dbi.BIGINT = DBAPITypeObject(('BIGINT',))
+    dbi.FLOAT = DBAPITypeObject(('FLOAT', 'REAL', 'DOUBLE', 'DECFLOAT'))
+    dbi.DECIMAL = DBAPITypeObject(('DECIMAL', 'DEC', 'NUMERIC', 'NUM'))
+    dbi.DATE = DBAPITypeObject(('DATE',))
+    dbi.TIME = DBAPITypeObject(('TIME',))
+    dbi.DATETIME = DBAPITypeObject(('TIMESTAMP',))
+    dbi.ROWID = DBAPITypeObject(())
+    dbi.BOOLEAN = DBAPITypeObject(('BOOLEAN',))
+    dbi.SQL_ATTR_AUTOCOMMIT = ibm_db.SQL_ATTR_AUTOCOMMIT
+    dbi.SQL_AUTOCOMMIT_OFF = ibm_db.SQL_AUTOCOMMIT_OFF
+    dbi.SQL_AUTOCOMMIT_ON = ibm_db.SQL_AUTOCOMMIT_ON
+
+    class Connection(object):
+        FIX_RETURN_TYPE = 1
+
+        def __init__(self, dbms_name='DB2/LINUXX8664', dbms_ver='11.05.0700'):
+            self.conn_handler = object()
+            self.dbms_name = dbms_name
+            self.dbms_ver = dbms_ver
+            self._current_schema = 'BENCH'
+
+        def server_info(self):
+            return (self.dbms_name, self.dbms_ver)
+
+        def cursor(self):
+            return Cursor(self.conn_handler, self)
+
+        def get_current_schema(self):
+            return self._current_schema
+
+        def set_current_schema(self, schema):
+            self._current_schema = schema.upper()
+            return True
+
+        set_autocommit = set_option = commit = rollback = close = _noop
+
+    class Cursor(object):
+        """
+        Keeps its state in the same private attributes as the real cursor,
+        the backend sets ``_Cursor__rowcount`` itself.
+        """
+
+        def __init__(self, conn_handler, conn_object=None):
+            self.arraysize = 1
+            self.__rowcount = -1
+            self.__description = None
+            self.__connection = conn_object
+            self.conn_handler = conn_handler
+            self.stmt_handler = None
+            self.messages = []
+            self.FIX_RETURN_TYPE = 1
+            self._rows = None
+            self._position = 0
+
+        rowcount = property(lambda self: self.__rowcount)
+        description = property(lambda self: self.__description)
+        connection = property(lambda self: self.__connection)
+
+        def _prepare_helper(self, operation, parameters=None):
+            self.stmt_handler = ibm_db.prepare(self.conn_handler, operation)
+
+        def _execute_helper(self, parameters=None):
+            return True
+
+        def _set_result(self, operation, parameters):
+            result = _results(operation, parameters) if _results is not None else None
+            if result is None:
+                self.__description = None
+                self._rows = None
+                self.__rowcount = 1
+            else:
+                self.__description, self._rows = result
+                self.__rowcount = -1
+            self._position = 0
+
+        def execute(self, operation, parameters=None):
+            self._prepare_helper(operation)
+            self._execute_helper(parameters)
+            self._set_result(operation, parameters)
+            return True
+
+        def executemany(self, operation, seq_parameters):
+            self._prepare_helper(operation)
+            self.__rowcount = ibm_db.execute_many(self.stmt_handler, tuple(seq_parameters))
+            self.__description = None
+            self._rows = None
+            return True
+
+        def _take(self, count):
+            if not self._rows:
+                return []
+            start = self._position
+            self._position = start + count if count is not None else len(self._rows)
+            return self._rows[start:self._position]
+
+        def fetchone(self):
+            rows = self._take(1)
+            return rows[0] if rows else None
+
+        def fetchmany(self, size=0):
+            return self._take(size or self.arraysize)
+
+        def fetchall(self):
+            return self._take(None)
+
+        def close(self):
+            self.stmt_handler = None
+            return True
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            row = self.fetchone()
+            if row is None:
+                raise StopIteration
+            return row
+
+    def connect(dsn='', user='', password='', host='', database='', conn_options=None, **kwargs):
+        return Connection()
+
+    dbi.Connection = Connection
+    dbi.Cursor = Cursor
+    dbi.connect = connect
+    dbi.pconnect = connect
+    dbi.createdb = dbi.dropdb = dbi.recreatedb = _noop
+    return dbi
+
+
+def install():
+    """
+    Put the fake driver modules in place of the real ones.
+    """
+    ibm_db = _build_ibm_db()
+    sys.modules['ibm_db'] = ibm_db
+    sys.modules['ibm_db_dbi'] = _build_ibm_db_dbi(ibm_db)
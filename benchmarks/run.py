@@ -0,0 +1,251 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Times the statement rewriting, SQL compilation, bulk inserts and row
+conversion of ibm_db_django against the fake driver of ``fake_ibm_db``.
+
+    python -m benchmarks.run --save before.json
+    git checkout my-branch
+    python -m benchmarks.run --compare before.json
+
+With ``--compare`` every benchmark slower than the saved run by more than
+``--threshold`` percent is reported as a regression and the exit status is 1.
+``-k`` selects the benchmarks whose name contains one of the given strings.
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import timeit
+from decimal import Decimal
+
+from benchmarks import fake_ibm_db
+
+fake_ibm_db.install()
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    DATABASES={
+        'default': {
+            'ENGINE': 'ibm_db_django',
+            'NAME': 'BENCH',
+            'USER': 'bench',
+            'PASSWORD': 'bench',
+            'HOST': 'localhost',
+            'PORT': '50000',
+        },
+        'nocache': {
+            'ENGINE': 'ibm_db_django',
+            'NAME': 'BENCH',
+            'USER': 'bench',
+            'PASSWORD': 'bench',
+            'HOST': 'localhost',
+            'PORT': '50000',
+            'OPTIONS': {'STATEMENT_CACHE_SIZE': 0},
+        },
+    },
+    INSTALLED_APPS=['benchmarks'],
+    USE_TZ=True,
+)
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from benchmarks.models import Book, Tag  # noqa: E402
+
+STRING, NUMBER, DECIMAL, DATETIME = (
+    sys.modules['ibm_db_dbi'].STRING, sys.modules['ibm_db_dbi'].NUMBER,
+    sys.modules['ibm_db_dbi'].DECIMAL, sys.modules['ibm_db_dbi'].DATETIME,
+)
+# Rows hold naive UTC timestamps like DB2 returns them, parameters are aware.
+PUBLISHED = datetime.datetime(2020, 5, 17, 10, 30, 15, 250000)
+PUBLISHED_UTC = timezone.make_aware(PUBLISHED, timezone.utc)
+
+
+def _description(*types):
+    return tuple(('C%d' % position, type_code, None, None, None, None, True)
+                 for position, type_code in enumerate(types))
+
+
+BOOK_DESCRIPTION = _description(NUMBER, STRING, DECIMAL, DATETIME, NUMBER)
+BOOK_AUTHOR_DESCRIPTION = _description(NUMBER, STRING, DECIMAL, DATETIME, NUMBER, NUMBER, STRING)
+
+
+def _book_rows(count):
+    return [(pk, 'Title %d' % pk, Decimal('19.99'), PUBLISHED, pk % 50)
+            for pk in range(1, count + 1)]
+
+
+def _book_author_rows(count):
+    return [row + (row[4], 'Author %d' % row[4]) for row in _book_rows(count)]
+
+
+def _results(description, rows):
+    def results(operation, parameters):
+        if operation.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return description, rows
+        return None
+    return results
+
+
+# Every benchmark takes no argument and returns the callable to time.
+BENCHMARKS = []
+
+
+def benchmark(number):
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, number, setup))
+        return setup
+    return register
+
+
+def _execute_rewrite(alias):
+    cursor = connections[alias].cursor()
+    operation = (
+        'SELECT "ID", "TITLE" FROM "BENCHMARKS_BOOK" WHERE "PRICE" > %s AND "TITLE" LIKE %s '
+        'AND "AUTHOR_ID" IN (%s, %s, %s, %s, %s) AND "PUBLISHED" < %s'
+    )
+    parameters = [Decimal('10.00'), 'Title%', 1, 2, 3, 4, 5, PUBLISHED_UTC]
+    fake_ibm_db.set_results(None)
+    return lambda: cursor.execute(operation, parameters)
+
+
+@benchmark(20000)
+def execute_rewrite():
+    return _execute_rewrite('default')
+
+
+@benchmark(5000)
+def execute_rewrite_uncached():
+    return _execute_rewrite('nocache')
+
+
+@benchmark(5000)
+def compile_filtered_sliced_query():
+    queryset = Book.objects.select_related('author').filter(
+        price__gt=Decimal('10.00'), author__name__startswith='A',
+    ).order_by('-published', 'title', 'pk')[40:60]
+    return lambda: queryset.query.get_compiler('default').as_sql()
+
+
+@benchmark(2000)
+def orm_select_related_page():
+    queryset = Book.objects.select_related('author').filter(price__gt=Decimal('10.00'))[20:40]
+    rows = _book_author_rows(20)
+    fake_ibm_db.set_results(_results(BOOK_AUTHOR_DESCRIPTION, rows))
+    return lambda: list(queryset.all())
+
+
+@benchmark(20)
+def fetchall_10000_rows():
+    cursor = connections['default'].cursor()
+    rows = _book_rows(10000)
+    fake_ibm_db.set_results(_results(BOOK_DESCRIPTION, rows))
+
+    def run():
+        cursor.execute('SELECT * FROM "BENCHMARKS_BOOK"')
+        return cursor.fetchall()
+    return run
+
+
+@benchmark(10)
+def orm_iterator_10000_rows():
+    rows = _book_rows(10000)
+    fake_ibm_db.set_results(_results(BOOK_DESCRIPTION, rows))
+    return lambda: sum(1 for book in Book.objects.iterator())
+
+
+@benchmark(50)
+def bulk_create_1000_rows():
+    tags = [Tag(name='tag-%d' % position, weight=position) for position in range(1000)]
+    fake_ibm_db.set_results(None)
+    return lambda: Tag.objects.bulk_create(tags)
+
+
+@benchmark(50)
+def executemany_1000_rows():
+    cursor = connections['default'].cursor()
+    rows = [(position, 'Title %d' % position, Decimal('19.99'), PUBLISHED_UTC, position % 50)
+            for position in range(1000)]
+    fake_ibm_db.set_results(None)
+    operation = 'INSERT INTO "BENCHMARKS_BOOK" VALUES (%s, %s, %s, %s, %s)'
+    return lambda: cursor.executemany(operation, rows)
+
+
+def run(names=None, repeat=5):
+    """
+    Return the best time per call in seconds of each selected benchmark.
+    """
+    timings = {}
+    for name, number, setup in BENCHMARKS:
+        if names and not any(selected in name for selected in names):
+            continue
+        statement = setup()
+        statement()
+        timings[name] = min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+    return timings
+
+
+def compare(timings, saved, threshold):
+    """
+    Print the change of every benchmark against ``saved`` and return the
+    names of those slower by more than ``threshold`` percent.
+    """
+    regressions = []
+    for name, seconds in timings.items():
+        if name not in saved:
+            print('%-32s %12.2f us  (new)' % (name, seconds * 1e6))
+            continue
+        change = (seconds - saved[name]) / saved[name] * 100
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-32s %12.2f us  %+7.1f%%%s' % (name, seconds * 1e6, change, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='names', action='append', help='run the benchmarks whose name contains NAMES')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per benchmark, the best one counts')
+    parser.add_argument('--save', metavar='FILE', help='save the timings to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare the timings with those saved in FILE')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percentage by which a benchmark has to be slower to count as a regression')
+    args = parser.parse_args(argv)
+
+    timings = run(args.names, args.repeat)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as saved:
+            regressions = compare(timings, json.load(saved), args.threshold)
+    else:
+        for name, seconds in timings.items():
+            print('%-32s %12.2f us' % (name, seconds * 1e6))
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump(timings, output, indent=2, sort_keys=True)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
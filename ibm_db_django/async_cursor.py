@@ -0,0 +1,176 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Cursors usable from coroutines.
+
+Every ``AsyncConnection`` opens a DB2 connection of its own and runs all
+driver calls for it on a dedicated thread, so awaiting a query never blocks
+the event loop and queries on separate ``AsyncConnection`` objects overlap.
+Statements and results are the same as those of the blocking cursors.
+
+    from ibm_db_django.async_cursor import connect
+
+    async with connect('default') as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute('SELECT "ID", "NAME" FROM "APP_AUTHOR" WHERE "ID" > %s', [10])
+            async for row in cursor:
+                ...
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class AsyncCursor(object):
+    """
+    Runs the calls of a ``DB2CursorWrapper`` on the thread of its
+    ``AsyncConnection``. Iterating fetches ``arraysize`` rows at a time.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 100
+        self._cursor = None
+        self._rows = []
+
+    def _call(self, name, *args):
+        def call():
+            if self._cursor is None:
+                self._cursor = self.connection._create_cursor()
+            return getattr(self._cursor, name)(*args)
+        return self.connection._run(call)
+
+    @property
+    def description(self):
+        return self._cursor.description if self._cursor is not None else None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount if self._cursor is not None else -1
+
+    async def execute(self, sql, params=None):
+        self._rows = []
+        await self._call('execute', sql, params)
+        return self
+
+    async def executemany(self, sql, param_list):
+        self._rows = []
+        await self._call('executemany', sql, param_list)
+        return self
+
+    async def fetchone(self):
+        if self._rows:
+            return self._rows.pop(0)
+        return await self._call('fetchone')
+
+    async def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        if len(rows) < size:
+            rows.extend(await self._call('fetchmany', size - len(rows)))
+        return rows
+
+    async def fetchall(self):
+        rows, self._rows = self._rows, []
+        rows.extend(await self._call('fetchall'))
+        return rows
+
+    async def close(self):
+        self._rows = []
+        if self._cursor is not None:
+            await self._call('close')
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._rows:
+            self._rows = list(await self._call('fetchmany', self.arraysize))
+            if not self._rows:
+                raise StopAsyncIteration
+        return self._rows.pop(0)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class AsyncConnection(object):
+    """
+    DB2 connection with the settings of the database ``using``, opened on
+    first use and taken from the connection pool when OPTIONS['POOL_MAX_SIZE']
+    is set. Autocommit is on, ``set_autocommit``, ``commit`` and ``rollback``
+    control transactions.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.wrapper = connections[using]
+        self.connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args))
+
+    def _ensure_connection(self):
+        if self.connection is None:
+            self.connection = self.wrapper.get_new_connection(self.wrapper.get_connection_params())
+        return self.connection
+
+    def _create_cursor(self):
+        return self.wrapper.databaseWrapper._cursor(self._ensure_connection())
+
+    def cursor(self):
+        return AsyncCursor(self)
+
+    async def set_autocommit(self, autocommit):
+        await self._run(lambda: self._ensure_connection().set_autocommit(autocommit))
+
+    async def commit(self):
+        if self.connection is not None:
+            await self._run(self.connection.commit)
+
+    async def rollback(self):
+        if self.connection is not None:
+            await self._run(self.connection.rollback)
+
+    async def close(self):
+        """
+        Close the connection, or hand it back to its pool, and stop the thread.
+        """
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            await self._run(self.wrapper.databaseWrapper.close, connection)
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        await self._run(self._ensure_connection)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def connect(using=DEFAULT_DB_ALIAS):
+    """
+    Return a new ``AsyncConnection`` to the database ``using``.
+    """
+    return AsyncConnection(using)
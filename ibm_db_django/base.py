@@ -76,10 +76,7 @@ if ( djangoVersion[0:2] >= ( 1, 6 )):
     NotSupportedError = Database.NotSupportedError
     
 
-if _IS_JYTHON:
-    dbms_name = 'dbname'
-else:
-    dbms_name = 'dbms_name'
+from ibm_db_django.server import server_profile
     
 class DatabaseFeatures( BaseDatabaseFeatures ):    
     can_use_chunked_reads = True
@@ -104,7 +101,17 @@ class DatabaseFeatures( BaseDatabaseFeatures ):
     requires_rollback_on_dirty_transaction = True
     supports_regex_backreferencing = True
     supports_timezones = False
-    has_bulk_insert = False
+    # Multi-row inserts are written as VALUES lists on DB2 LUW and as a UNION
+    # ALL fullselect on DB2 for z/OS, see DatabaseOperations.bulk_insert_sql.
+    has_bulk_insert = True
+    # Generated keys of a bulk insert are read back through FINAL TABLE in the
+    # order of a VALUES row list, which DB2 for z/OS lacks. Set once connected.
+    can_return_ids_from_bulk_insert = False
+    # Set once connected, see DatabaseWrapper._supports_offset_fetch_clause.
+    supports_offset_fetch_clause = False
+    # Test databases are cloned as schemas with ADMIN_COPY_SCHEMA, which only
+    # DB2 LUW provides. Set once connected, see DatabaseCreation._clone_test_db.
+    can_clone_databases = False
     has_select_for_update = True
     supports_long_model_names = False
     can_distinct_on_fields = False
@@ -317,11 +324,15 @@ class DatabaseWrapper( BaseDatabaseWrapper ):
     # To get new connection from Database
     def get_new_connection(self, conn_params):
         connection = self.databaseWrapper.get_new_connection(conn_params)
-        if getattr(connection, dbms_name) == 'DB2':
-            self.features.has_bulk_insert = False
-        else:
-            self.features.has_bulk_insert = True
+        if not _IS_JYTHON:
+            self.features.supports_offset_fetch_clause = self._supports_offset_fetch_clause( connection )
+            self.features.can_return_ids_from_bulk_insert = server_profile( connection ).is_luw
+            self.features.can_clone_databases = server_profile( connection ).is_luw
         return connection
+
+    # OFFSET n ROWS is available from DB2 LUW 11.1, DB2 for z/OS 12 and DB2 for i 7.1.
+    def _supports_offset_fetch_clause( self, connection ):
+        return server_profile( connection ).supports_offset_fetch
         
     # Over-riding _cursor method to return DB2 cursor.
     if ( djangoVersion[0:2] < ( 1, 6 )):
@@ -342,7 +353,13 @@ class DatabaseWrapper( BaseDatabaseWrapper ):
             return cursor
     else:
         def create_cursor( self , name = None):
+            if name is not None and not _IS_JYTHON:
+                return self.databaseWrapper._streaming_cursor( self.connection )
             return self.databaseWrapper._cursor( self.connection )
+
+        # QuerySet.iterator() reads through a forward-only streaming cursor.
+        def chunked_cursor( self ):
+            return self._cursor( name = 'chunked' )
             
         def init_connection_state( self ):
             pass
@@ -374,6 +391,27 @@ class DatabaseWrapper( BaseDatabaseWrapper ):
             self.cursor()
         return self.databaseWrapper.get_server_version( self.connection )
     
+    # Hit and miss counters of the statement rewriting cache of the current connection.
+    def statement_cache_info( self ):
+        cache = getattr( self.connection, 'statement_cache', None )
+        if cache is None:
+            return None
+        return cache.info()
+    
+    # Hit and miss counters of the prepared statement pool of the current connection.
+    def prepared_statement_pool_info( self ):
+        pool = getattr( self.connection, 'prepared_statements', None )
+        if pool is None:
+            return None
+        return pool.info()
+    
+    # Size and counters of the connection pool the current connection belongs to.
+    def connection_pool_info( self ):
+        pool = getattr( self.connection, 'connection_pool', None )
+        if pool is None:
+            return None
+        return pool.stats()
+    
     def schema_editor(self, *args, **kwargs):
         return DB2SchemaEditor(self, *args, **kwargs)
    
@@ -273,7 +273,23 @@ class SQLCompiler( compiler.SQLCompiler ):
                         children[index] = tuple( node )
 
 class SQLInsertCompiler( compiler.SQLInsertCompiler, SQLCompiler ):
-    pass
+    def as_sql(self):
+        """
+        Wrap a multi-row insert whose generated keys are wanted in a SELECT
+        from its FINAL TABLE, so the keys come back in the order of the objects.
+        """
+        if not (self.return_id and len(self.query.objs) > 1):
+            return super(SQLInsertCompiler, self).as_sql()
+        self.return_id = False
+        try:
+            (sql, params), = super(SQLInsertCompiler, self).as_sql()
+        finally:
+            self.return_id = True
+        opts = self.query.get_meta()
+        sql = 'SELECT %s FROM FINAL TABLE (%s) ORDER BY INPUT SEQUENCE' % (
+            self.connection.ops.quote_name(opts.pk.column), sql,
+        )
+        return [(sql, params)]
 
 class SQLDeleteCompiler( compiler.SQLDeleteCompiler, SQLCompiler ):
     pass
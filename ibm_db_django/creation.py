@@ -16,6 +16,7 @@
 # | Authors: Ambrish Bhargava, Tarun Pasrija, Rahul Priyadarshi              |
 # +--------------------------------------------------------------------------+
 
+import hashlib
 import sys
 _IS_JYTHON = sys.platform.startswith( 'java' )
 
@@ -36,10 +37,8 @@ from django.core.management import call_command
 from django import VERSION as djangoVersion
 from django.db.backends.utils import truncate_name
 
-if _IS_JYTHON:
-    dbms_name = 'dbname'
-else:
-    dbms_name = 'dbms_name'
+from ibm_db_django.server import server_profile
+
 TEST_DBNAME_PREFIX = 'test_'
 
 class DatabaseCreation ( BaseDatabaseCreation ):
@@ -110,7 +109,7 @@ class DatabaseCreation ( BaseDatabaseCreation ):
         # ignore tablespace information
         tablespace_sql = ''
         i = 0
-        if( djangoVersion[0:2] >= ( 1, 8 ) and  'DB2' not in getattr(self.connection.connection, dbms_name)) or getattr(self.connection.connection, dbms_name) != 'DB2':
+        if( djangoVersion[0:2] >= ( 1, 8 ) and  'DB2' not in server_profile(self.connection.connection).name) or not server_profile(self.connection.connection).is_zos:
             if len( model._meta.unique_together_index ) != 0:
                 for unique_together_index in model._meta.unique_together_index:
                     i = i + 1
@@ -160,6 +159,7 @@ class DatabaseCreation ( BaseDatabaseCreation ):
     # For Jython this method prepare the settings file's database. First it drops the tables from the database,then create tables on the basis of installed models.
     def create_test_db( self, verbosity = 0, autoclobber = False , keepdb=False,serialize=False):
         kwargs = self.__create_test_kwargs()
+        reuse_test_database = False
         if not _IS_JYTHON:
             old_database = kwargs['database']
             max_db_name_length = self.connection.ops.max_db_name_length()
@@ -209,17 +209,15 @@ class DatabaseCreation ( BaseDatabaseCreation ):
                                 print ("Tests cancelled")
                                 sys.exit( 1 )
                             else:
-                                if not autoclobber:
-                                    confirm = input( "\nTest database: %s already exist. Type yes to recreate it, or no to exit" % ( kwargs.get( 'database' ) ) )
-                                else:
-                                    confirm = input( "\nTest database: %s already exist. Type yes to recreate it, or no to exit" % ( kwargs.get( 'database' ) ) )
-                                if autoclobber or confirm == 'yes':
+                                if self._template_schema() is not None:
+                                    # The template schema lives in the test database, keep it.
+                                    # Whether the server supports templates is only checked
+                                    # once connected to the test database, below.
+                                    reuse_test_database = True
                                     if verbosity > 1:
-                                        print(("Recreating Test Database %s" % ( kwargs.get( 'database' ) )))
-                                    Database.recreatedb( **kwargs )
+                                        print(("Using existing Test Database %s" % ( kwargs.get( 'database' ) )))
                                 else:
-                                    print ("Tests cancelled.")
-                                    sys.exit( 1 )
+                                    self.__recreate_test_db( kwargs, autoclobber, verbosity )
             else:
                 confirm = input("Wants to use %s as test database, Type yes to use it as test database or no to exit" % ( old_database ) )
                 if confirm == 'yes':
@@ -245,6 +243,11 @@ class DatabaseCreation ( BaseDatabaseCreation ):
         else:
             self.connection.settings_dict['NAME'] = test_database
             self.connection.settings_dict['PCONNECT'] = False     
+            # Whatever was opened so far is connected to the database of the settings.
+            self.connection.close()
+            if reuse_test_database and not self._supports_schema_copy():
+                self.connection.close()
+                self.__recreate_test_db( kwargs, autoclobber, verbosity )
             # Confirm the feature set of the test database
             if( ( 1, 2 ) < djangoVersion[0:2] < (1,5) ):
                 self.connection.features.confirm()
@@ -252,7 +255,9 @@ class DatabaseCreation ( BaseDatabaseCreation ):
                 call_command( 'syncdb', database = self.connection.alias, verbosity = verbosity, interactive = False, load_initial_data = False )
             else:
                 if(djangoVersion[0:2] >= (2 , 0)):
-                    call_command( 'migrate', database = self.connection.alias, verbosity = verbosity, interactive = False)
+                    if not self._restore_template( verbosity ):
+                        call_command( 'migrate', database = self.connection.alias, verbosity = verbosity, interactive = False)
+                        self._save_template( verbosity )
                     if serialize:
                         self.connection._test_serialized_contents = self.serialize_db_to_string()
                 else:
@@ -261,12 +266,33 @@ class DatabaseCreation ( BaseDatabaseCreation ):
             #call_command('flush', database=self.connection.alias, verbosity = verbosity, interactive=False)
         return test_database
     
+    # Recreates the test database left by a previous run, after confirmation.
+    def __recreate_test_db( self, kwargs, autoclobber, verbosity ):
+        if not autoclobber:
+            confirm = input( "\nTest database: %s already exist. Type yes to recreate it, or no to exit" % ( kwargs.get( 'database' ) ) )
+        else:
+            confirm = input( "\nTest database: %s already exist. Type yes to recreate it, or no to exit" % ( kwargs.get( 'database' ) ) )
+        if autoclobber or confirm == 'yes':
+            if verbosity > 1:
+                print(("Recreating Test Database %s" % ( kwargs.get( 'database' ) )))
+            Database.recreatedb( **kwargs )
+        else:
+            print ("Tests cancelled.")
+            sys.exit( 1 )
+
     # Method to destroy database. For Jython nothing is getting done over here.
     def destroy_test_db(self, old_database_name=None, verbosity=1, keepdb=False, suffix=None):
+        if suffix is not None:
+            self.__destroy_test_db_clone( suffix, verbosity, keepdb )
+            return old_database_name
         print ("Destroying Database...")
         if not _IS_JYTHON:
             kwargs = self.__create_test_kwargs()
-            if( old_database_name != kwargs.get( 'database' ) ):
+            if( self._keeps_test_database() ):
+                # Kept for the template schema, see create_test_db.
+                if verbosity > 1:
+                    print(("Keeping Test Database %s" % ( kwargs.get( 'database' ) )))
+            elif( old_database_name != kwargs.get( 'database' ) ):
                 kwargsKeys = list(kwargs.keys())
                 if ( kwargsKeys.__contains__( 'port' ) and 
                     kwargsKeys.__contains__( 'host' ) ):
@@ -281,6 +307,7 @@ class DatabaseCreation ( BaseDatabaseCreation ):
                     del kwargs['port']
                 if verbosity > 1:
                     print(("Droping Test Database %s" % ( kwargs.get( 'database' ) )))
+                self.connection.close()
                 Database.dropdb( **kwargs )
                 
             if( djangoVersion[0:2] <= ( 1, 1 ) ):
@@ -291,9 +318,176 @@ class DatabaseCreation ( BaseDatabaseCreation ):
                 self.connection.settings_dict['PCONNECT'] = True
         return old_database_name
     
+    # Settings of the clone of the test database used by the parallel test runner
+    # process numbered suffix. Clones are schemas of the test database, so only
+    # CURRENTSCHEMA changes.
+    def get_test_db_clone_settings( self, suffix ):
+        settings_dict = dict( self.connection.settings_dict )
+        settings_dict['CURRENTSCHEMA'] = self._clone_schema( suffix )
+        return settings_dict
+
+    # Copies the migrated test schema to the schema of clone suffix.
+    def _clone_test_db( self, suffix, verbosity, keepdb = False ):
+        if not self._supports_schema_copy():
+            raise NotImplementedError(
+                "Test databases are cloned with ADMIN_COPY_SCHEMA, which only DB2 LUW provides. "
+                "Disable the option to run tests in parallel processes." )
+        source = self._test_schema()
+        target = self._clone_schema( suffix )
+        with self.connection.cursor() as cursor:
+            if keepdb and self._schema_exists( cursor, target ):
+                return
+            if verbosity > 1:
+                print(("Copying schema %s to %s..." % ( source, target )))
+            self._drop_schema( cursor, target )
+            self._copy_schema( cursor, source, target )
+        self.connection.commit()
+
+    # Test tables are created in CURRENTSCHEMA, or in the schema named after
+    # the user when it is not set. Worked out from the settings since the
+    # parallel test runner asks for the clone settings in forked processes,
+    # before they close the connection inherited from the parent.
+    def _test_schema( self ):
+        settings_dict = self.connection.settings_dict
+        return ( settings_dict.get( 'CURRENTSCHEMA' ) or settings_dict['USER'] ).upper()
+
+    def _clone_schema( self, suffix ):
+        return truncate_name( "%s_%s" % ( self._test_schema(), suffix ), 128 )
+
+    # Name of the schema keeping a copy of the migrated test schema between runs,
+    # TEST['TEMPLATE_SCHEMA'] of the database settings, or None.
+    def _template_schema( self ):
+        test_settings = self.connection.settings_dict.get( 'TEST' ) or {}
+        template = test_settings.get( 'TEMPLATE_SCHEMA' )
+        return template.upper() if template else None
+
+    # The test database outlives a run when it holds a template schema. Connects,
+    # so only called once the settings name the test database.
+    def _keeps_test_database( self ):
+        return self._template_schema() is not None and self._supports_schema_copy()
+
+    # Schemas are copied with ADMIN_COPY_SCHEMA, which only DB2 LUW provides.
+    def _supports_schema_copy( self ):
+        self.connection.ensure_connection()
+        return server_profile( self.connection.connection ).is_luw
+
+    # Digest of the migrations on disk and of the models of apps without
+    # migrations, which decide the schema migrate creates.
+    def _migration_fingerprint( self ):
+        from django.apps import apps
+        from django.db.migrations.loader import MigrationLoader
+        loader = MigrationLoader( None, ignore_no_migrations = True )
+        digest = hashlib.sha256()
+        modules = set()
+        for key in sorted( loader.disk_migrations ):
+            digest.update( ( "%s.%s\n" % key ).encode( 'utf-8' ) )
+            modules.add( type( loader.disk_migrations[key] ).__module__ )
+        for app_config in apps.get_app_configs():
+            digest.update( ( "%s\n" % app_config.label ).encode( 'utf-8' ) )
+            if app_config.label in loader.unmigrated_apps and app_config.models_module is not None:
+                modules.add( app_config.models_module.__name__ )
+        for name in sorted( modules ):
+            path = getattr( sys.modules.get( name ), '__file__', None )
+            if path:
+                with open( path, 'rb' ) as source:
+                    digest.update( source.read() )
+        return digest.hexdigest()
+
+    # Replaces the test schema by a copy of the template schema when the
+    # template was saved for the same migrations, and returns whether it did.
+    # Otherwise the test schema left by the previous run is dropped for
+    # migrate to start from scratch.
+    def _restore_template( self, verbosity ):
+        template = self._template_schema()
+        if template is None or not self._supports_schema_copy():
+            return False
+        fingerprint = self._migration_fingerprint()
+        with self.connection.cursor() as cursor:
+            self._check_test_server( cursor )
+            schema = self._current_schema( cursor )
+            self._drop_schema( cursor, schema )
+            cursor.execute( "SELECT REMARKS FROM SYSCAT.SCHEMATA WHERE SCHEMANAME = %s", [template] )
+            row = cursor.fetchone()
+            if row is None or row[0] != fingerprint:
+                return False
+            if verbosity >= 1:
+                print(("Restoring schema %s from template %s, the migrations are unchanged..." % ( schema, template )))
+            self._copy_schema( cursor, template, schema )
+        self.connection.commit()
+        return True
+
+    # Copies the migrated test schema, data included, to the template schema
+    # and records the fingerprint of the migrations in its remarks.
+    def _save_template( self, verbosity ):
+        template = self._template_schema()
+        if template is None:
+            return
+        if not self._supports_schema_copy():
+            if verbosity >= 1:
+                print ("TEST['TEMPLATE_SCHEMA'] is only supported on DB2 LUW, the test schema is migrated on every run.")
+            return
+        fingerprint = self._migration_fingerprint()
+        with self.connection.cursor() as cursor:
+            schema = self._current_schema( cursor )
+            if verbosity >= 1:
+                print(("Saving schema %s as template %s..." % ( schema, template )))
+            self._drop_schema( cursor, template )
+            self._copy_schema( cursor, schema, template )
+            cursor.execute( "COMMENT ON SCHEMA %s IS '%s'" % ( self.connection.ops.quote_name( template ), fingerprint ) )
+        self.connection.commit()
+
+    # Refuses to go on unless the connection is to the test database, as the
+    # test schema is dropped next.
+    def _check_test_server( self, cursor ):
+        cursor.execute( "VALUES CURRENT SERVER" )
+        server = cursor.fetchone()[0].strip()
+        test_database = self.connection.settings_dict['NAME']
+        if server.upper() != test_database.upper():
+            raise Database.DatabaseError( "Connected to database %s instead of the test database %s, "
+                "not dropping the test schema." % ( server, test_database ) )
+
+    def _current_schema( self, cursor ):
+        cursor.execute( "VALUES CURRENT SCHEMA" )
+        return cursor.fetchone()[0].strip()
+
+    def _schema_exists( self, cursor, schema ):
+        cursor.execute( "SELECT 1 FROM SYSCAT.SCHEMATA WHERE SCHEMANAME = %s", [schema] )
+        return cursor.fetchone() is not None
+
+    def _drop_schema( self, cursor, schema ):
+        if self._schema_exists( cursor, schema ):
+            self.__call_schema_procedure( cursor, 'SYSPROC.ADMIN_DROP_SCHEMA', [schema, None] )
+
+    # Copies the tables with their data, indexes, constraints, sequences and
+    # views of the schema source to the new schema target.
+    def _copy_schema( self, cursor, source, target ):
+        self.__call_schema_procedure( cursor, 'SYSPROC.ADMIN_COPY_SCHEMA', [source, target, 'COPY', None, None, None] )
+
+    # ADMIN_COPY_SCHEMA and ADMIN_DROP_SCHEMA report the objects they failed on
+    # in an error table, whose name they return, created in the schema named
+    # after the connecting user.
+    def __call_schema_procedure( self, cursor, procedure, parameters ):
+        error_schema = ( self.connection.settings_dict.get( 'USER' ) or 'SYSTOOLS' ).upper()
+        result = cursor.callproc( procedure, parameters + [error_schema, 'DJANGO_SCHEMA_ERRORS'] )
+        if result and result[-1] is not None:
+            raise Database.DatabaseError( "%s(%s) failed, the errors are in table %s.%s" % (
+                procedure, ", ".join( repr( parameter ) for parameter in parameters ), result[-2], result[-1] ) )
+
+    # Drops the schema of clone suffix, the test database itself is dropped
+    # along with the test schema.
+    def __destroy_test_db_clone( self, suffix, verbosity, keepdb ):
+        if keepdb:
+            return
+        schema = self._clone_schema( suffix )
+        if verbosity > 1:
+            print(("Dropping schema %s..." % ( schema )))
+        with self.connection.cursor() as cursor:
+            self._drop_schema( cursor, schema )
+        self.connection.commit()
+
     # As DB2 does not allow to insert NULL value in UNIQUE col, hence modifing model.
     def sql_create_model( self, model, style, known_models = set() ):
-        if getattr(self.connection.connection, dbms_name) != 'DB2':
+        if not server_profile(self.connection.connection).is_zos:
             model._meta.unique_together_index = []
             temp_changed_uvalues = []
             temp_unique_together = model._meta.unique_together
@@ -0,0 +1,190 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Timing of the statements run through the DB2 cursors.
+
+Sinks registered with ``add_sink`` receive a ``QueryEvent`` for every
+``execute`` and ``executemany`` and one for the rows fetched from each result
+set. The times separate the adapter's own work, rewriting statements and
+converting rows, from the round trips of the driver. Nothing is measured
+while no sink is registered.
+
+    from ibm_db_django import instrumentation
+    histogram = instrumentation.HistogramSink()
+    instrumentation.add_sink(histogram)
+    ...
+    for fingerprint, stats in histogram.top(10):
+        ...
+"""
+
+import bisect
+import logging
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger('ibm_db_django.instrumentation')
+
+# ``kind`` is 'execute', 'executemany' or 'fetch'. ``rows`` is the number of
+# rows affected by a statement or fetched from a result set. Times are in
+# seconds, ``rewrite_time`` and ``convert_time`` are spent in the adapter,
+# ``execute_time`` and ``fetch_time`` in the driver and the server.
+QueryEvent = namedtuple(
+    'QueryEvent',
+    'kind fingerprint rewrite_time execute_time fetch_time convert_time rows'
+)
+
+# Registered sinks, replaced rather than changed so the cursors can read it
+# without locking.
+sinks = ()
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """
+    Register ``sink``, a callable taking a ``QueryEvent``.
+    """
+    global sinks
+    with _sinks_lock:
+        if sink not in sinks:
+            sinks = sinks + (sink,)
+
+
+def remove_sink(sink):
+    global sinks
+    with _sinks_lock:
+        sinks = tuple(registered for registered in sinks if registered != sink)
+
+
+def record(event):
+    for sink in sinks:
+        try:
+            sink(event)
+        except Exception:
+            logger.exception("Instrumentation sink %r failed.", sink)
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w$#@"])[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?\b')
+_LIST_RE = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def _fingerprint(operation):
+    operation = _STRING_RE.sub('?', operation)
+    operation = _NUMBER_RE.sub('?', operation)
+    operation = _LIST_RE.sub('?, ...', operation)
+    return _SPACE_RE.sub(' ', operation).strip()
+
+
+def fingerprint(operation):
+    """
+    Return ``operation`` with its literals replaced by markers, lists of
+    markers collapsed and whitespace normalized, so statements differing
+    only in their values share the fingerprint.
+    """
+    return _fingerprint(operation)
+
+
+class LoggingSink(object):
+    """
+    Logs every event to ``logger``, a logger or its name, at ``level``.
+    """
+
+    def __init__(self, logger='django.db.backends', level=logging.DEBUG):
+        if not isinstance(logger, logging.Logger):
+            logger = logging.getLogger(logger)
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                "%s rewrite=%.6f execute=%.6f fetch=%.6f convert=%.6f rows=%d %s",
+                event.kind, event.rewrite_time, event.execute_time, event.fetch_time,
+                event.convert_time, event.rows, event.fingerprint,
+                extra={'event': event},
+            )
+
+
+class HistogramSink(object):
+    """
+    Aggregates the events per fingerprint in process: counts, total times
+    and rows, and a histogram of the driver time of each statement over the
+    upper bounds ``bounds`` in seconds.
+    """
+
+    default_bounds = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+    def __init__(self, bounds=default_bounds):
+        self.bounds = tuple(sorted(bounds))
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            stats = self._stats.get(event.fingerprint)
+            if stats is None:
+                stats = self._stats[event.fingerprint] = {
+                    'count': 0,
+                    'rewrite_time': 0.0,
+                    'execute_time': 0.0,
+                    'fetch_time': 0.0,
+                    'convert_time': 0.0,
+                    'rows': 0,
+                    'histogram': [0] * (len(self.bounds) + 1),
+                }
+            if event.kind != 'fetch':
+                stats['count'] += 1
+                stats['histogram'][bisect.bisect_left(self.bounds, event.execute_time)] += 1
+            stats['rewrite_time'] += event.rewrite_time
+            stats['execute_time'] += event.execute_time
+            stats['fetch_time'] += event.fetch_time
+            stats['convert_time'] += event.convert_time
+            stats['rows'] += event.rows
+
+    def snapshot(self):
+        """
+        Return a copy of the statistics keyed by fingerprint.
+        """
+        with self._lock:
+            return dict(
+                (fingerprint, dict(stats, histogram=list(stats['histogram'])))
+                for fingerprint, stats in self._stats.items()
+            )
+
+    def top(self, n=10, key=None):
+        """
+        Return the ``n`` (fingerprint, statistics) pairs taking the most time,
+        or the most of the statistic ``key``.
+        """
+        if key is None:
+            def total(item):
+                stats = item[1]
+                return (stats['rewrite_time'] + stats['execute_time'] +
+                        stats['fetch_time'] + stats['convert_time'])
+        else:
+            def total(item):
+                return item[1][key]
+        return sorted(self.snapshot().items(), key=total, reverse=True)[:n]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -16,7 +16,10 @@
 # | Authors: Ambrish Bhargava, Tarun Pasrija, Rahul Priyadarshi              |
 # +--------------------------------------------------------------------------+
 from collections import namedtuple
+import copy
+import re
 import sys
+import time
 _IS_JYTHON = sys.platform.startswith( 'java' )
 
 if not _IS_JYTHON:
@@ -36,6 +39,18 @@ except ImportError:
 
 from django import VERSION as djangoVersion
 
+from ibm_db_django.server import server_profile
+
+# Statements changing the catalog and the table names they name.
+_DDL_RE = re.compile(r'\s*(CREATE|ALTER|DROP|RENAME|COMMENT)\b', re.I)
+_DDL_NAME = r'(?:"[^"]+"|[\w$#@]+)(?:\s*\.\s*(?:"[^"]+"|[\w$#@]+))?'
+_DDL_TABLE_RES = (
+    re.compile(r'^\s*(?:CREATE|ALTER|DROP|RENAME)\s+TABLE\s+(%s)' % _DDL_NAME, re.I),
+    re.compile(r'^\s*RENAME\s+TABLE\s+%s\s+TO\s+(%s)' % (_DDL_NAME, _DDL_NAME), re.I),
+    re.compile(r'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+%s\s+ON\s+(%s)' % (_DDL_NAME, _DDL_NAME), re.I),
+)
+_DDL_NAME_PART_RE = re.compile(r'"[^"]+"|[\w$#@]+')
+
 class DatabaseIntrospection( BaseDatabaseIntrospection ):
     
     """
@@ -89,6 +104,79 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
 
         return super(DatabaseIntrospection, self).get_field_type(data_type, description)
     
+    def __init__(self, *args, **kwargs):
+        super(DatabaseIntrospection, self).__init__(*args, **kwargs)
+        # ( schema, table ) -> { kind: ( expires, value ) }
+        self._catalog_cache = {}
+
+    # Seconds catalog metadata stays cached, OPTIONS['CATALOG_CACHE_TTL'].
+    @property
+    def catalog_cache_ttl(self):
+        if _IS_JYTHON:
+            return 0
+        options = self.connection.settings_dict.get('OPTIONS') or {}
+        return options.get('CATALOG_CACHE_TTL', 0)
+
+    def _cache_key(self, cursor, table_name):
+        return (cursor.connection.get_current_schema().upper(), table_name.upper())
+
+    def _cache_put(self, cursor, kind, table_name, value):
+        ttl = self.catalog_cache_ttl
+        if ttl:
+            entries = self._catalog_cache.setdefault(self._cache_key(cursor, table_name), {})
+            entries[kind] = (time.time() + ttl, value)
+
+    # Returns the cached value of kind for the table, or computes and caches it.
+    # Callers get a copy, so changing the result leaves the cache intact.
+    def _cached(self, cursor, kind, table_name, compute):
+        if not self.catalog_cache_ttl:
+            return compute()
+        entry = self._catalog_cache.get(self._cache_key(cursor, table_name), {}).get(kind)
+        if entry is not None and entry[0] > time.time():
+            value = entry[1]
+        else:
+            value = compute()
+            self._cache_put(cursor, kind, table_name, value)
+        return list(value) if isinstance(value, list) else copy.deepcopy(value)
+
+    def invalidate_catalog_cache(self, sql=None):
+        """
+        Drop the cached metadata of the tables changed by the DDL statement
+        ``sql``, or all of it when no statement is given or the tables of the
+        statement can't be told.
+        """
+        if sql is None:
+            self._catalog_cache.clear()
+            return
+        match = _DDL_RE.match(sql)
+        if match is None:
+            return
+        if match.group(1).upper() == 'COMMENT':
+            return
+        tables = set()
+        for pattern in _DDL_TABLE_RES:
+            for name in pattern.findall(sql):
+                tables.add(_DDL_NAME_PART_RE.findall(name)[-1].strip('"').upper())
+        # Dropping a table or an index can affect the metadata of other tables.
+        if not tables or match.group(1).upper() == 'DROP':
+            self._catalog_cache.clear()
+            return
+        for key in list(self._catalog_cache):
+            if key[1] in tables:
+                del self._catalog_cache[key]
+
+    def get_relations(self, cursor, table_name):
+        return self._cached(cursor, 'relations', table_name, lambda: self._get_relations(cursor, table_name))
+
+    def get_key_columns(self, cursor, table_name):
+        return self._cached(cursor, 'key_columns', table_name, lambda: self._get_key_columns(cursor, table_name))
+
+    def get_indexes(self, cursor, table_name):
+        return self._cached(cursor, 'indexes', table_name, lambda: self._get_indexes(cursor, table_name))
+
+    def get_table_description(self, cursor, table_name):
+        return self._cached(cursor, 'description', table_name, lambda: self._get_table_description(cursor, table_name))
+
     # Converting table name to lower case.
     def table_name_converter ( self, name ):        
         return name.lower()
@@ -125,7 +213,7 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
         return table_list
     
     # Generating a dictionary for foreign key details, which are present under current schema.
-    def get_relations( self, cursor, table_name ):
+    def _get_relations( self, cursor, table_name ):
         relations = {}
         if not _IS_JYTHON:
             schema = cursor.connection.get_current_schema()
@@ -158,7 +246,7 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
                 #col[16] is index of column in table
                 return col[16] - 1
     
-    def get_key_columns(self, cursor, table_name):
+    def _get_key_columns(self, cursor, table_name):
         relations = []
         if not _IS_JYTHON:
             schema = cursor.connection.get_current_schema()
@@ -178,7 +266,7 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
         return relations
         
     # Getting list of indexes associated with the table provided.
-    def get_indexes( self, cursor, table_name ):
+    def _get_indexes( self, cursor, table_name ):
         indexes = {}
         # To skip indexes across multiple fields
         multifield_indexSet = set()
@@ -237,7 +325,7 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
         return indexes
     
     # Getting the description of the table.
-    def get_table_description( self, cursor, table_name ):
+    def _get_table_description( self, cursor, table_name ):
         qn = self.connection.ops.quote_name
         description = []
         table_type = 'T'
@@ -249,12 +337,12 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
             return description
 
         if not _IS_JYTHON:
-            dbms_name='dbms_name'
             schema = cursor.connection.get_current_schema()
+            server = server_profile(cursor.connection)
 
-            if (getattr(cursor.connection, dbms_name) == 'AS'):
+            if (server.name == 'AS'):
                  sql = "SELECT TYPE FROM QSYS2.SYSTABLES WHERE TABLE_SCHEMA='%(schema)s' AND TABLE_NAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            elif ( getattr(cursor.connection, dbms_name) != 'DB2'):
+            elif ( not server.is_zos ):
                  sql = "SELECT TYPE FROM SYSCAT.TABLES WHERE TABSCHEMA='%(schema)s' AND TABNAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
             else:
                 sql = "SELECT TYPE FROM SYSIBM.SYSTABLES WHERE CREATOR='%(schema)s' AND NAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
@@ -278,84 +366,152 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
         return description
 
     def get_constraints(self, cursor, table_name):
-        constraints = {} 
         if not _IS_JYTHON:
-            schema = cursor.connection.get_current_schema()
-            dbms_name='dbms_name'
+            return self._cached(cursor, 'constraints', table_name, lambda:
+                self._load_constraints(cursor, table_name))
+        return {}
 
-            if (getattr(cursor.connection, dbms_name) == 'AS'):
-                sql = "SELECT CONSTRAINT_NAME, COLUMN_NAME FROM QSYS2.SYSCSTCOL WHERE TABLE_SCHEMA='%(schema)s' AND TABLE_NAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            elif ( getattr(cursor.connection, dbms_name) != 'DB2'):
-                sql = "SELECT CONSTNAME, COLNAME FROM SYSCAT.COLCHECKS WHERE TABSCHEMA='%(schema)s' AND TABNAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            else:
-                sql = "SELECT CHECKNAME, COLNAME FROM SYSIBM.SYSCHECKDEP WHERE TBOWNER='%(schema)s' AND TBNAME='%(table)s'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            cursor.execute(sql)
-            for constname, colname in cursor.fetchall():
-                constname = constname.lower()
-                if constname not in constraints:
-                    constraints[constname] = {
-                        'columns': [],
-                        'primary_key': False,
-                        'unique': False,
-                        'foreign_key': None,
-                        'check': True,
-                        'index': False
-                    }
-                constraints[constname]['columns'].append(colname.lower())
-                
-            if getattr(cursor.connection, dbms_name) == 'AS':
-                sql = "SELECT KEYCOL.CONSTRAINT_NAME, KEYCOL.COLUMN_NAME FROM QSYS2.SYSKEYCST KEYCOL INNER JOIN QSYS2.SYSCST TABCONST ON KEYCOL.CONSTRAINT_NAME=TABCONST.CONSTRAINT_NAME WHERE TABCONST.TABLE_SCHEMA='%(schema)s' and TABCONST.TABLE_NAME='%(table)s' and TABCONST.TYPE='U'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            elif ( getattr(cursor.connection, dbms_name) != 'DB2'):
-               sql = "SELECT KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSCAT.KEYCOLUSE KEYCOL INNER JOIN SYSCAT.TABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME WHERE TABCONST.TABSCHEMA='%(schema)s' and TABCONST.TABNAME='%(table)s' and TABCONST.TYPE='U'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            else:
-                sql = "SELECT KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSIBM.SYSKEYCOLUSE KEYCOL INNER JOIN SYSIBM.SYSTABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME WHERE TABCONST.TBCREATOR='%(schema)s' AND TABCONST.TBNAME='%(table)s' AND TABCONST.TYPE='U'" % {'schema': schema.upper(), 'table': table_name.upper()}
-            cursor.execute(sql)
-            for constname, colname in cursor.fetchall():
-                constname = constname.lower()
-                if constname not in constraints:
-                    constraints[constname] = {
-                        'columns': [],
-                        'primary_key': False,
-                        'unique': True,
-                        'foreign_key': None,
-                        'check': False,
-                        'index': True
-                    }
-                constraints[constname]['columns'].append(colname.lower())
-            
-            for pkey in cursor.connection.primary_keys(None, schema, table_name):
-                pkey['PK_NAME'] = pkey['PK_NAME'].lower()
-                if pkey['PK_NAME'] not in constraints:
-                    constraints[pkey['PK_NAME']] = {
-                        'columns': [],
-                        'primary_key': True,
-                        'unique': False,
-                        'foreign_key': None,
-                        'check': False,
-                        'index': True
-                    }
-                constraints[pkey['PK_NAME']]['columns'].append(pkey['COLUMN_NAME'].lower())    
-            
-            for fk in cursor.connection.foreign_keys( True, schema, table_name ):
-                fk['FK_NAME'] = fk['FK_NAME'].lower()
-                if fk['FK_NAME'] not in constraints:
-                    constraints[fk['FK_NAME']] = {
-                        'columns': [],
-                        'primary_key': False,
-                        'unique': False,
-                        'foreign_key': (fk['PKTABLE_NAME'].lower(), fk['PKCOLUMN_NAME'].lower()),
-                        'check': False,
-                        'index': False
-                    }
-                constraints[fk['FK_NAME']]['columns'].append(fk['FKCOLUMN_NAME'].lower())
-                if fk['PKCOLUMN_NAME'].lower() not in constraints[fk['FK_NAME']]['foreign_key']:
-                    fkeylist = list(constraints[fk['FK_NAME']]['foreign_key'])
-                    fkeylist.append(fk['PKCOLUMN_NAME'].lower())
-                    constraints[fk['FK_NAME']]['foreign_key'] = tuple(fkeylist)
+    # With the catalog cache on, the first miss in a schema reads the
+    # constraints of all its tables, so inspectdb and the like make one round
+    # trip per catalog view instead of one per table. Servers read table by
+    # table for keys only load the table asked for.
+    def _load_constraints(self, cursor, table_name):
+        table_names = [table_name]
+        schema = cursor.connection.get_current_schema().upper()
+        if (self.catalog_cache_ttl and 'foreign_key' in self._constraint_queries[self._constraint_server(cursor)] and
+                not any(key[0] == schema and 'constraints' in entries for key, entries in self._catalog_cache.items())):
+            table_names = None
+        return self.get_constraints_for_tables(cursor, table_names).get(table_name.lower(), {})
 
-            sql = "SELECT INDNAME, COLNAMES, UNIQUERULE, INDEXTYPE from SYSCAT.INDEXES where TABNAME = '%s'" % table_name.upper()
-            cursor.execute(sql)
-            for INDEX_NAME, COLUMN_NAME, UNIQUE_RULE, INDEX_TYPE in cursor.fetchall():
+    def _constraint_server(self, cursor):
+        server = server_profile(cursor.connection).name
+        if server != 'AS' and server != 'DB2':
+            server = 'LUW'
+        return server
+
+    # Catalog queries of get_constraints_for_tables per server, the column names
+    # of the schema and table predicates are given along with each query.
+    _constraint_queries = {
+        'AS': {
+            'check': ("SELECT CSTCOL.TABLE_NAME, CSTCOL.CONSTRAINT_NAME, CSTCOL.COLUMN_NAME FROM QSYS2.SYSCSTCOL CSTCOL",
+                      'CSTCOL.TABLE_SCHEMA', 'CSTCOL.TABLE_NAME'),
+            'unique': ("SELECT TABCONST.TABLE_NAME, KEYCOL.CONSTRAINT_NAME, KEYCOL.COLUMN_NAME FROM QSYS2.SYSKEYCST KEYCOL INNER JOIN QSYS2.SYSCST TABCONST ON KEYCOL.CONSTRAINT_NAME=TABCONST.CONSTRAINT_NAME WHERE TABCONST.TYPE='U'",
+                       'TABCONST.TABLE_SCHEMA', 'TABCONST.TABLE_NAME'),
+        },
+        'LUW': {
+            'check': ("SELECT CHK.TABNAME, CHK.CONSTNAME, CHK.COLNAME FROM SYSCAT.COLCHECKS CHK",
+                      'CHK.TABSCHEMA', 'CHK.TABNAME'),
+            'unique': ("SELECT TABCONST.TABNAME, KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSCAT.KEYCOLUSE KEYCOL INNER JOIN SYSCAT.TABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME AND KEYCOL.TABSCHEMA=TABCONST.TABSCHEMA AND KEYCOL.TABNAME=TABCONST.TABNAME WHERE TABCONST.TYPE='U'",
+                       'TABCONST.TABSCHEMA', 'TABCONST.TABNAME', 'KEYCOL.COLSEQ'),
+            'primary_key': ("SELECT TABCONST.TABNAME, KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSCAT.KEYCOLUSE KEYCOL INNER JOIN SYSCAT.TABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME AND KEYCOL.TABSCHEMA=TABCONST.TABSCHEMA AND KEYCOL.TABNAME=TABCONST.TABNAME WHERE TABCONST.TYPE='P'",
+                            'TABCONST.TABSCHEMA', 'TABCONST.TABNAME', 'KEYCOL.COLSEQ'),
+            'foreign_key': ("SELECT REF.TABNAME, REF.CONSTNAME, FKCOL.COLNAME, REF.REFTABNAME, PKCOL.COLNAME FROM SYSCAT.REFERENCES REF INNER JOIN SYSCAT.KEYCOLUSE FKCOL ON FKCOL.CONSTNAME=REF.CONSTNAME AND FKCOL.TABSCHEMA=REF.TABSCHEMA AND FKCOL.TABNAME=REF.TABNAME INNER JOIN SYSCAT.KEYCOLUSE PKCOL ON PKCOL.CONSTNAME=REF.REFKEYNAME AND PKCOL.TABSCHEMA=REF.REFTABSCHEMA AND PKCOL.TABNAME=REF.REFTABNAME AND PKCOL.COLSEQ=FKCOL.COLSEQ",
+                            'REF.TABSCHEMA', 'REF.TABNAME', 'FKCOL.COLSEQ'),
+        },
+        'DB2': {
+            'check': ("SELECT CHK.TBNAME, CHK.CHECKNAME, CHK.COLNAME FROM SYSIBM.SYSCHECKDEP CHK",
+                      'CHK.TBOWNER', 'CHK.TBNAME'),
+            'unique': ("SELECT TABCONST.TBNAME, KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSIBM.SYSKEYCOLUSE KEYCOL INNER JOIN SYSIBM.SYSTABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME AND KEYCOL.TBCREATOR=TABCONST.TBCREATOR AND KEYCOL.TBNAME=TABCONST.TBNAME WHERE TABCONST.TYPE='U'",
+                       'TABCONST.TBCREATOR', 'TABCONST.TBNAME', 'KEYCOL.COLSEQ'),
+            'primary_key': ("SELECT TABCONST.TBNAME, KEYCOL.CONSTNAME, KEYCOL.COLNAME FROM SYSIBM.SYSKEYCOLUSE KEYCOL INNER JOIN SYSIBM.SYSTABCONST TABCONST ON KEYCOL.CONSTNAME=TABCONST.CONSTNAME AND KEYCOL.TBCREATOR=TABCONST.TBCREATOR AND KEYCOL.TBNAME=TABCONST.TBNAME WHERE TABCONST.TYPE='P'",
+                            'TABCONST.TBCREATOR', 'TABCONST.TBNAME', 'KEYCOL.COLSEQ'),
+            'foreign_key': ("SELECT REL.TBNAME, REL.RELNAME, FKCOL.COLNAME, REL.REFTBNAME, PKCOL.COLNAME FROM SYSIBM.SYSRELS REL INNER JOIN SYSIBM.SYSFOREIGNKEYS FKCOL ON FKCOL.CREATOR=REL.CREATOR AND FKCOL.TBNAME=REL.TBNAME AND FKCOL.RELNAME=REL.RELNAME INNER JOIN SYSIBM.SYSKEYS PKCOL ON PKCOL.IXCREATOR=REL.IXOWNER AND PKCOL.IXNAME=REL.IXNAME AND PKCOL.COLSEQ=FKCOL.COLSEQ",
+                            'REL.CREATOR', 'REL.TBNAME', 'FKCOL.COLSEQ'),
+        },
+    }
+
+    # Number of table names per IN list of the catalog queries.
+    constraint_tables_per_query = 500
+
+    def get_constraints_for_tables(self, cursor, table_names=None):
+        """
+        Return the constraints of the tables ``table_names`` of the current
+        schema, or of all its tables, as a dictionary keyed by lower case table
+        name. Every catalog view is read with a single query for all tables.
+        """
+        if _IS_JYTHON:
+            return {}
+        schema = cursor.connection.get_current_schema().upper()
+        queries = self._constraint_queries[self._constraint_server(cursor)]
+        if table_names is None:
+            chunks = [None]
+        else:
+            names = sorted(set(name.upper() for name in table_names))
+            size = self.constraint_tables_per_query
+            chunks = [names[start:start + size] for start in range(0, len(names), size)]
+
+        tables = {}
+        if table_names is not None:
+            for name in table_names:
+                tables[name.lower()] = {}
+
+        def constraint(table, name, **flags):
+            constraints = tables.setdefault(table.lower(), {})
+            name = name.lower()
+            if name not in constraints:
+                constraints[name] = dict({
+                    'columns': [],
+                    'primary_key': False,
+                    'unique': False,
+                    'foreign_key': None,
+                    'check': False,
+                    'index': False,
+                }, **flags)
+            return constraints[name]
+
+        def rows(kind):
+            sql, schema_column, table_column = queries[kind][:3]
+            sql = "%s %s %s = '%s'" % (sql, 'AND' if ' WHERE ' in sql else 'WHERE', schema_column, schema)
+            result = []
+            for chunk in chunks:
+                chunk_sql = sql
+                if chunk is not None:
+                    chunk_sql = "%s AND %s IN (%s)" % (sql, table_column, ', '.join("'%s'" % name for name in chunk))
+                if len(queries[kind]) > 3:
+                    chunk_sql = "%s ORDER BY %s, %s" % (chunk_sql, table_column, queries[kind][3])
+                cursor.execute(chunk_sql)
+                result.extend(cursor.fetchall())
+            return result
+
+        # Servers without catalog queries for keys are asked table by table.
+        if table_names is None and ('primary_key' not in queries or 'foreign_key' not in queries):
+            table_names = [table['TABLE_NAME'] for table in cursor.connection.tables(schema)]
+
+        for table, constname, colname in rows('check'):
+            constraint(table, constname, check=True)['columns'].append(colname.lower())
+
+        for table, constname, colname in rows('unique'):
+            constraint(table, constname, unique=True, index=True)['columns'].append(colname.lower())
+
+        if 'primary_key' in queries:
+            for table, constname, colname in rows('primary_key'):
+                constraint(table, constname, primary_key=True, index=True)['columns'].append(colname.lower())
+        else:
+            for table in table_names:
+                for pkey in cursor.connection.primary_keys(None, schema, table):
+                    constraint(pkey['TABLE_NAME'], pkey['PK_NAME'], primary_key=True, index=True)['columns'].append(pkey['COLUMN_NAME'].lower())
+
+        if 'foreign_key' in queries:
+            foreign_keys = rows('foreign_key')
+        else:
+            foreign_keys = []
+            for table in table_names:
+                for fk in cursor.connection.foreign_keys(True, schema, table):
+                    foreign_keys.append((fk['FKTABLE_NAME'], fk['FK_NAME'], fk['FKCOLUMN_NAME'], fk['PKTABLE_NAME'], fk['PKCOLUMN_NAME']))
+        for table, constname, colname, reftable, refcolname in foreign_keys:
+            fk = constraint(table, constname, foreign_key=(reftable.lower(), refcolname.lower()))
+            fk['columns'].append(colname.lower())
+            if refcolname.lower() not in fk['foreign_key']:
+                fk['foreign_key'] = fk['foreign_key'] + (refcolname.lower(),)
+
+        sql = "SELECT TABNAME, INDNAME, COLNAMES, UNIQUERULE, INDEXTYPE FROM SYSCAT.INDEXES WHERE TABSCHEMA = '%s'" % schema
+        for chunk in chunks:
+            if chunk is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute("%s AND TABNAME IN (%s)" % (sql, ', '.join("'%s'" % name for name in chunk)))
+            for TABLE_NAME, INDEX_NAME, COLUMN_NAME, UNIQUE_RULE, INDEX_TYPE in cursor.fetchall():
+                constraints = tables.setdefault(TABLE_NAME.lower(), {})
                 INDEX_NAME = INDEX_NAME.lower()
                 COLUMN_NAME = COLUMN_NAME.lower()
                 if INDEX_NAME not in constraints:
@@ -378,7 +534,10 @@ class DatabaseIntrospection( BaseDatabaseIntrospection ):
                 constraints[INDEX_NAME]['columns'] = COLUMN_NAME
                 constraints[INDEX_NAME]['orders'] = ['ASC'] * len(COLUMN_NAME)
 
-            return constraints
+        # The returned dictionaries are the caller's to change, cache copies.
+        for table, constraints in tables.items():
+            self._cache_put(cursor, 'constraints', table, copy.deepcopy(constraints))
+        return tables
 
     def get_sequences(self,cursor, table_name,table_fields=()):
         from django.apps import apps
@@ -40,13 +40,13 @@ if( djangoVersion[0:2] >= ( 1, 4 ) ):
     from django.utils.timezone import is_aware, is_naive, utc 
     from django.conf import settings
 
-if _IS_JYTHON:
-    dbms_name = 'dbname'
-else:
-    dbms_name = 'dbms_name'
+from ibm_db_django.server import server_profile
     
 class DatabaseOperations ( BaseDatabaseOperations ):
     cast_char_field_without_max_length = 'varchar'
+    # Limits of a single statement, used to size bulk inserts.
+    max_bulk_insert_params = 32767
+    max_statement_length = 2097152
     def __init__( self, connection ):
         if( djangoVersion[0:2] >= ( 1, 4 ) ):
             super( DatabaseOperations, self ).__init__(self)
@@ -318,7 +318,7 @@ class DatabaseOperations ( BaseDatabaseOperations ):
         return "%s"
         
     def deferrable_sql( self ):
-        if getattr(self.connection.connection, dbms_name) == 'DB2':
+        if server_profile(self.connection.connection).is_zos:
             return "ON DELETE NO ACTION NOT ENFORCED"
         else:
             return ""
@@ -376,6 +376,18 @@ class DatabaseOperations ( BaseDatabaseOperations ):
     
     def no_limit_value( self ):
         return None
+
+    # Newer servers skip rows with OFFSET n ROWS FETCH FIRST m ROWS ONLY. Older
+    # ones only know FETCH FIRST, an offset is then left to LIMIT/OFFSET which
+    # needs the MySQL compatibility vector.
+    def limit_offset_sql( self, low_mark, high_mark ):
+        limit, offset = self._get_limit_offset_params( low_mark, high_mark )
+        if self.connection.features.supports_offset_fetch_clause or not offset:
+            return '%s%s' % (
+                ( ' OFFSET %d ROWS' % offset ) if offset else '',
+                ( ' FETCH FIRST %d ROWS ONLY' % limit ) if limit else '',
+            )
+        return super( DatabaseOperations, self ).limit_offset_sql( low_mark, high_mark )
     
     # Method to point custom query class implementation.
     def query_class( self, DefaultQueryClass ):
@@ -426,7 +438,7 @@ class DatabaseOperations ( BaseDatabaseOperations ):
         sqls = []
         if tables:
             #check for zOS DB2 server
-            if getattr(self.connection.connection, dbms_name) != 'DB2':
+            if not server_profile(self.connection.connection).is_zos:
                 fk_tab = 'TABNAME'
                 fk_tabschema = 'TABSCHEMA'
                 fk_const = 'CONSTNAME'
@@ -488,7 +500,7 @@ class DatabaseOperations ( BaseDatabaseOperations ):
                         END IF;
                     END P1''' % {'fk_tab':fk_tab, 'fk_tabschema':fk_tabschema, 'fk_const':fk_const, 'fk_systab':fk_systab, 'type_check_string':type_check_string} )  
             
-            if getattr(self.connection.connection, dbms_name) != 'DB2':
+            if not server_profile(self.connection.connection).is_zos:
                 for table in tables:
                     sqls.append( "CALL FKEY_ALT_CONST( '%s', '%s' );" % ( table.upper(), curr_schema ) )
             else:
@@ -499,7 +511,7 @@ class DatabaseOperations ( BaseDatabaseOperations ):
                            style.SQL_KEYWORD( "FROM" ) + " " + 
                            style.SQL_TABLE( "%s" % self.quote_name( table ) ) )
                 
-            if getattr(self.connection.connection, dbms_name) != 'DB2':    
+            if not server_profile(self.connection.connection).is_zos:    
                 sqls.append( "CALL FKEY_ALT_CONST( '' , '%s' );" % ( curr_schema, ) )
                 sqls.append( "DROP PROCEDURE FKEY_ALT_CONST;" )  
                 
@@ -628,10 +640,41 @@ class DatabaseOperations ( BaseDatabaseOperations ):
             upper_bound = datetime.date(int(value), 12, 31)
         return [lower_bound, upper_bound]
     
+    # DB2 for z/OS has no multi-row VALUES clause, so the rows are inserted from
+    # a UNION ALL fullselect. Parameter markers in a select list must be typed,
+    # hence the casts to the column types.
     def bulk_insert_sql(self, fields, num_values):
+        if len( num_values ) > 1 and self._is_zos():
+            rows_sql = []
+            for row in num_values:
+                columns_sql = []
+                for field, placeholder in zip( fields, row ):
+                    if field is not None and placeholder == '%s':
+                        placeholder = "CAST(%%s AS %s)" % field.cast_db_type( self.connection )
+                    columns_sql.append( placeholder )
+                rows_sql.append( "SELECT %s FROM SYSIBM.SYSDUMMY1" % ", ".join( columns_sql ) )
+            return " UNION ALL ".join( rows_sql )
         placeholder_rows_sql = (", ".join(row) for row in num_values)
         values_sql = ", ".join("(%s)" % sql for sql in placeholder_rows_sql)
         return "VALUES " + values_sql
+
+    # A statement is limited to 32767 parameter markers and 2MB of text, the
+    # text of a row is estimated generously since DECIMAL values get inlined.
+    def bulk_batch_size(self, fields, objs):
+        if not fields:
+            # Rows without any column are inserted as VALUES (DEFAULT), which
+            # DB2 for z/OS cannot combine into one statement.
+            return 1 if self._is_zos() else len( objs )
+        row_length = 64 + 64 * len( fields )
+        return max( min( len( objs ), self.max_bulk_insert_params // len( fields ), self.max_statement_length // row_length ), 1 )
+
+    # Rows of SELECT ... FROM FINAL TABLE ( INSERT ... ) ORDER BY INPUT SEQUENCE
+    def fetch_returned_insert_ids(self, cursor):
+        return [row[0] for row in cursor.fetchall()]
+
+    def _is_zos(self):
+        self.connection.ensure_connection()
+        return server_profile(self.connection.connection).is_zos
     
     def for_update_sql(self, nowait=False, skip_locked=False, of=()):
         #DB2 doesn't support nowait select for update
@@ -0,0 +1,136 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Keyset (seek) pagination for ordered QuerySets.
+
+An OFFSET still makes DB2 read and discard every row of the earlier pages.
+A keyset page instead starts right after the ordering values of the last row
+of the previous page, so with an index on the ordering columns every page
+costs the same however deep it is.
+
+    paginator = KeysetPaginator(Order.objects.order_by('-created', 'pk'), 100)
+    page = paginator.page()
+    while page:
+        ...
+        page = paginator.page(after=page.next_key)
+"""
+
+from django.db.models import Q
+
+
+class KeysetPage(list):
+    """
+    Objects of one page. ``next_key`` holds the ordering values of the last
+    object, to be passed as ``after`` for the following page, and is None on
+    the last page.
+    """
+
+    def __init__(self, objects, next_key):
+        super(KeysetPage, self).__init__(objects)
+        self.next_key = next_key
+
+    @property
+    def has_next(self):
+        return self.next_key is not None
+
+
+class KeysetPaginator(object):
+    """
+    Pages through ``queryset`` by the values of its ordering fields.
+
+    The ordering has to consist of plain field names of non-nullable columns.
+    The primary key is appended when it is missing so the ordering is unique.
+    """
+
+    def __init__(self, queryset, per_page):
+        if per_page < 1:
+            raise ValueError("per_page must be at least 1.")
+        self.per_page = per_page
+        self.ordering = self._get_ordering(queryset)
+        self.queryset = queryset.order_by(
+            *[('-%s' if descending else '%s') % name for name, descending in self.ordering]
+        )
+        # The directions above already account for reverse(), which order_by()
+        # would otherwise apply a second time.
+        self.queryset.query.standard_ordering = True
+
+    def _get_ordering(self, queryset):
+        query = queryset.query
+        if query.extra_order_by:
+            raise ValueError("Keyset pagination does not support extra(order_by=...).")
+        ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+        if not ordering:
+            raise ValueError("Keyset pagination requires an ordered QuerySet.")
+        result = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?' or '__' in item:
+                raise ValueError(
+                    "Keyset pagination only supports ordering by field names, got %r." % (item,)
+                )
+            descending = item.startswith('-')
+            if not query.standard_ordering:
+                descending = not descending
+            result.append((item.lstrip('-+'), descending))
+        pk = query.get_meta().pk
+        if not any(name in ('pk', pk.name, pk.attname) for name, descending in result):
+            result.append(('pk', result[-1][1]))
+        return result
+
+    def _get_key(self, obj):
+        return tuple(getattr(obj, self._get_attname(obj, name)) for name, descending in self.ordering)
+
+    def _get_attname(self, obj, name):
+        if name == 'pk':
+            return 'pk'
+        return obj._meta.get_field(name).attname
+
+    def _after(self, key):
+        # (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        condition = Q()
+        for position, (name, descending) in enumerate(self.ordering):
+            term = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): key[position]})
+            for previous, (previous_name, previous_descending) in enumerate(self.ordering[:position]):
+                term &= Q(**{previous_name: key[previous]})
+            condition |= term
+        return condition
+
+    def page(self, after=None):
+        """
+        Return the page following the key ``after``, or the first page.
+        """
+        queryset = self.queryset
+        if after is not None:
+            if len(after) != len(self.ordering):
+                raise ValueError("The key does not match the ordering of the QuerySet.")
+            queryset = queryset.filter(self._after(after))
+        objects = list(queryset[:self.per_page + 1])
+        if len(objects) > self.per_page:
+            del objects[self.per_page:]
+            return KeysetPage(objects, self._get_key(objects[-1]))
+        return KeysetPage(objects, None)
+
+    def __iter__(self):
+        """
+        Iterate over the objects of all pages.
+        """
+        page = self.page()
+        while True:
+            for obj in page:
+                yield obj
+            if not page.has_next:
+                return
+            page = self.page(after=page.next_key)
@@ -0,0 +1,189 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Parallel scans of large tables.
+
+``parallel_scan`` splits the rows of a QuerySet into primary key ranges, or
+into the data partitions of a partitioned table, and reads every range on a
+connection of its own, from the connection pool when OPTIONS['POOL_MAX_SIZE']
+is set. Batches of rows are yielded as the ranges deliver them, so they are
+not in any particular order, and every range reads its own snapshot of the
+table.
+
+    for batch in parallel_scan(Order.objects.filter(year=2020), workers=8):
+        for pk, customer_id, total in batch:
+            ...
+"""
+
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import NotSupportedError, connections
+from django.db.models import Max, Min
+
+from ibm_db_django.server import server_profile
+
+_INTEGER_FIELDS = (
+    'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveSmallIntegerField',
+)
+# Seconds between checks whether the consumer went away while waiting to
+# hand over a batch.
+_PUT_TIMEOUT = 0.1
+
+
+class _Done(object):
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+def parallel_scan(queryset, workers=4, chunks=None, partitions=False, batch_size=2000,
+                  fields=None, columns=False):
+    """
+    Yield the rows of ``queryset`` in batches of up to ``batch_size`` rows
+    read by ``workers`` threads.
+
+    Rows are tuples of the values of ``fields``, by default those selected
+    by ``values()`` or ``values_list()`` or the concrete fields of the
+    model. With ``columns`` every batch is a dict of field name to the list
+    of its values instead. The table is split into ``chunks`` ranges of the
+    integer primary key, four per worker by default, or with ``partitions``
+    into its data partitions, which DB2 for z/OS and i do not support here.
+    """
+    if not queryset.query.can_filter():
+        raise ValueError("Cannot scan a sliced QuerySet in parallel.")
+    using = queryset.db
+    wrapper = connections[using]
+    if fields is None:
+        fields = queryset._fields or [field.attname for field in queryset.model._meta.concrete_fields]
+    queryset = queryset.using(using).order_by().values_list(*fields)
+    if partitions:
+        ranges = _partition_ranges(queryset, wrapper)
+    else:
+        ranges = _key_ranges(queryset, chunks or workers * 4)
+    statements = []
+    for chunk in ranges:
+        compiler = chunk.query.get_compiler(using)
+        sql, params = compiler.as_sql()
+        if sql:
+            statements.append((compiler, sql, params))
+    return _scan(wrapper, statements, max(workers, 1), batch_size, fields if columns else None)
+
+
+def _key_ranges(queryset, chunks):
+    pk = queryset.model._meta.pk
+    if pk.get_internal_type() not in _INTEGER_FIELDS:
+        raise ValueError("Parallel scans by key require an integer primary key.")
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    step = max(int(math.ceil((bounds['high'] - bounds['low'] + 1) / float(chunks))), 1)
+    return [
+        queryset.filter(pk__gte=start, pk__lt=start + step)
+        for start in range(bounds['low'], bounds['high'] + 1, step)
+    ]
+
+
+def _partition_ranges(queryset, wrapper):
+    wrapper.ensure_connection()
+    if not server_profile(wrapper.connection).is_luw:
+        raise NotSupportedError("Scans by data partition are only supported on DB2 LUW.")
+    with wrapper.cursor() as cursor:
+        cursor.execute(
+            "SELECT SEQNO FROM SYSCAT.DATAPARTITIONS WHERE TABSCHEMA = CURRENT SCHEMA AND TABNAME = %s ORDER BY SEQNO",
+            [queryset.model._meta.db_table.upper()]
+        )
+        partitions = [row[0] for row in cursor.fetchall()]
+    quote_name = wrapper.ops.quote_name
+    where = 'DATAPARTITIONNUM(%s.%s) = %%s' % (
+        quote_name(queryset.model._meta.db_table), quote_name(queryset.model._meta.pk.column)
+    )
+    return [queryset.extra(where=[where], params=[partition]) for partition in partitions]
+
+
+def _scan(wrapper, statements, workers, batch_size, names):
+    batches = queue.Queue(maxsize=workers * 2)
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(statements)) or 1)
+    futures = [
+        executor.submit(_read_range, wrapper, compiler, sql, params, batch_size, batches, stopped)
+        for compiler, sql, params in statements
+    ]
+    try:
+        remaining = len(statements)
+        while remaining:
+            batch = batches.get()
+            if isinstance(batch, _Done):
+                if batch.error is not None:
+                    raise batch.error
+                remaining -= 1
+            elif names is not None:
+                yield dict(zip(names, map(list, zip(*batch))))
+            else:
+                yield batch
+    finally:
+        stopped.set()
+        # Ranges not started yet are dropped rather than read for nothing.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _read_range(wrapper, compiler, sql, params, batch_size, batches, stopped):
+    if stopped.is_set():
+        return
+    error = None
+    try:
+        connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            if stopped.is_set():
+                return
+            if wrapper.features.can_use_chunked_reads:
+                cursor = wrapper.databaseWrapper._streaming_cursor(connection)
+            else:
+                cursor = wrapper.databaseWrapper._cursor(connection)
+            try:
+                cursor.execute(sql, params)
+                converters = compiler.get_converters([column[0] for column in compiler.select[0:compiler.col_count]])
+                while not stopped.is_set():
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if converters:
+                        rows = [tuple(row) for row in compiler.apply_converters(rows, converters)]
+                    if not _put(batches, rows, stopped):
+                        return
+            finally:
+                cursor.close()
+        finally:
+            wrapper.databaseWrapper.close(connection)
+    except Exception as exception:
+        error = exception
+    _put(batches, _Done(error), stopped)
+
+
+def _put(batches, item, stopped):
+    while not stopped.is_set():
+        try:
+            batches.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
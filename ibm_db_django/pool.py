@@ -0,0 +1,254 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+Process local pool of DB2 connections.
+
+Connections closed by Django, for example when CONN_MAX_AGE expires, are
+handed back to the pool of their connection parameters instead of being
+disconnected, so the next request skips the connect and authentication
+round trips. Pools are enabled with OPTIONS['POOL_MAX_SIZE'].
+"""
+
+import threading
+import time
+from collections import deque
+
+import ibm_db_dbi as Database
+
+
+class PoolTimeout(Database.OperationalError):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of connections created by ``connect``.
+
+    At most ``max_size`` connections are open at a time, callers wait up to
+    ``timeout`` seconds for one to be released. The pool opens ``min_size``
+    connections on first use and tops them up whenever a connection is
+    acquired. Idle connections beyond ``min_size`` are closed after
+    ``idle_timeout`` seconds and every
+    connection is closed once it is ``max_lifetime`` seconds old, 0 disables
+    either limit. With ``pre_ping`` an idle connection is checked with
+    ``is_active`` before it is handed out. ``disconnect`` closes a connection.
+    """
+
+    def __init__(self, connect, disconnect, is_active, min_size=0, max_size=10,
+                 idle_timeout=300, max_lifetime=3600, pre_ping=True, timeout=30):
+        self.connect = connect
+        self.disconnect = disconnect
+        self.is_active = is_active
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        # ( connection, created, released ), the most recently released last
+        self._idle = deque()
+        # id( connection ) -> created, for the connections handed out
+        self._in_use = {}
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition(threading.Lock())
+        self.connects = 0
+        self.reuses = 0
+        self.disconnects = 0
+        self.failed_pings = 0
+        self.timeouts = 0
+
+    def acquire(self):
+        if self._size < self.min_size:
+            self.fill()
+        deadline = time.time() + self.timeout
+        while True:
+            connection, created, expired = self._checkout(deadline)
+            self._disconnect_all(expired)
+            if connection is None:
+                return self._create()
+            if not self.pre_ping or self._ping(connection):
+                with self._condition:
+                    self._in_use[id(connection)] = created
+                    self.reuses += 1
+                return connection
+            with self._condition:
+                self.failed_pings += 1
+            self._discard(connection)
+
+    def fill(self):
+        """
+        Open idle connections until the pool holds ``min_size`` of them.
+        """
+        while True:
+            with self._condition:
+                if self._closed or self._size >= min(self.min_size, self.max_size):
+                    return
+                self._size += 1
+            connection = self._create()
+            with self._condition:
+                created = self._in_use.pop(id(connection))
+                self._idle.appendleft((connection, created, time.time()))
+                self._condition.notify()
+
+    def release(self, connection, discard=False):
+        with self._condition:
+            created = self._in_use.pop(id(connection), None)
+            foreign = created is None
+            if foreign:
+                if any(idle is connection for idle, _, _ in self._idle):
+                    # Released twice.
+                    return
+            elif self._closed or self._is_expired(created, time.time()):
+                discard = True
+            elif not discard:
+                self._idle.append((connection, created, time.time()))
+                self._condition.notify()
+        if foreign:
+            # Not handed out by this pool, hence not counted in its size.
+            self._disconnect_all([connection])
+        elif discard:
+            self._discard(connection)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, created, released in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        self._disconnect_all(idle)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'connects': self.connects,
+                'reuses': self.reuses,
+                'disconnects': self.disconnects,
+                'failed_pings': self.failed_pings,
+                'timeouts': self.timeouts,
+            }
+
+    # Returns an idle connection, or None when a new one may be created, along
+    # with the idle connections which expired meanwhile.
+    def _checkout(self, deadline):
+        expired = []
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("The connection pool is closed.")
+                now = time.time()
+                self._expire(now, expired)
+                if self._idle:
+                    connection, created, released = self._idle.pop()
+                    return connection, created, expired
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None, expired
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        "No connection was released within %s seconds, all %d "
+                        "connections of the pool are in use." % (self.timeout, self.max_size)
+                    )
+                self._condition.wait(remaining)
+
+    def _expire(self, now, expired):
+        kept = deque()
+        size = self._size
+        while self._idle:
+            connection, created, released = self._idle.popleft()
+            idle_too_long = (
+                self.idle_timeout and now - released > self.idle_timeout and size > self.min_size
+            )
+            if idle_too_long or self._is_expired(created, now):
+                expired.append(connection)
+                size -= 1
+            else:
+                kept.append((connection, created, released))
+        self._idle = kept
+        self._size = size
+
+    def _is_expired(self, created, now):
+        return bool(self.max_lifetime) and now - created > self.max_lifetime
+
+    def _create(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._in_use[id(connection)] = time.time()
+            self.connects += 1
+        return connection
+
+    def _ping(self, connection):
+        try:
+            return bool(self.is_active(connection))
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._disconnect_all([connection])
+
+    def _disconnect_all(self, connections):
+        for connection in connections:
+            with self._condition:
+                self.disconnects += 1
+            try:
+                self.disconnect(connection)
+            except Exception:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, disconnect, is_active, **settings):
+    """
+    Return the pool of the connection parameters ``key``, creating it with
+    ``settings`` on first use.
+    """
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, disconnect, is_active, **settings)
+        return pool
+
+
+def close_pools():
+    """
+    Close the idle connections of all pools, for example before forking.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
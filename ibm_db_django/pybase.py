@@ -26,9 +26,24 @@ except ImportError as e:
     raise ImportError( "ibm_db module not found. Install ibm_db module from http://code.google.com/p/ibm-db/. Error: %s" % e )
 
 from decimal import Decimal
-import regex
+from array import array
+import bisect
+import re
+
+from ibm_db_django.utils import LRUCache
+from ibm_db_django import pool as connection_pool
+from ibm_db_django import instrumentation
+from ibm_db_django.server import ServerProfile, server_profile
 
 import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy
+except ImportError:
+    numpy = None
 # For checking django's version
 from django import VERSION as djangoVersion
 
@@ -45,11 +60,6 @@ if ( djangoVersion[0:2] >= ( 1, 5 )):
     import re
  
 _IS_JYTHON = sys.platform.startswith( 'java' )
-if _IS_JYTHON:
-    dbms_name = 'dbname'
-else:
-    dbms_name = 'dbms_name'
-
 DatabaseError = Database.DatabaseError
 IntegrityError = Database.IntegrityError
 if ( djangoVersion[0:2] >= ( 1, 6 )):
@@ -60,7 +70,370 @@ if ( djangoVersion[0:2] >= ( 1, 6 )):
     InternalError = Database.InternalError
     ProgrammingError = Database.ProgrammingError
     NotSupportedError = Database.NotSupportedError
+
+# Adapter specific keys accepted in the OPTIONS dictionary along with their
+# default values. These are consumed by the adapter and never passed down
+# to ibm_db_dbi.connect.
+BACKEND_OPTIONS = {
+    # Number of rewritten statements kept per connection, 0 disables the cache.
+    'STATEMENT_CACHE_SIZE': 256,
+    # Number of prepared statement handles kept per connection, 0 disables the pool.
+    'PREPARED_STATEMENT_POOL_SIZE': 0,
+    # Number of parameter sets bound per round trip by executemany, 0 sends them all at once.
+    'EXECUTEMANY_CHUNK_SIZE': 0,
+    # Fetch buffer size in bytes of the streaming cursors used by QuerySet.iterator(),
+    # 0 keeps the CLI default.
+    'STREAMING_FETCH_BUFFER_SIZE': 0,
+    # Whether streaming cursors let the client prefetch the next block of rows.
+    'STREAMING_QUERY_PREFETCH': True,
+    # Whether NUL characters are removed from the strings of result sets.
+    'STRIP_NULS': True,
+    # Size limits of the process wide pool of the connection's parameters, a
+    # POOL_MAX_SIZE of 0 disables pooling. POOL_MIN_SIZE connections are opened
+    # up front and kept.
+    'POOL_MAX_SIZE': 0,
+    'POOL_MIN_SIZE': 0,
+    # Seconds after which idle connections beyond POOL_MIN_SIZE are closed, 0 keeps them.
+    'POOL_IDLE_TIMEOUT': 300,
+    # Seconds after which a connection is closed once released, 0 keeps it.
+    'POOL_MAX_LIFETIME': 3600,
+    # Whether idle connections are checked with is_active before being reused.
+    'POOL_PRE_PING': True,
+    # Seconds to wait for a connection when all of them are in use.
+    'POOL_TIMEOUT': 30,
+    # Seconds introspected table metadata is cached, 0 disables the cache.
+    # Changes made by other processes or outside of the schema editor are
+    # not seen while an entry is cached, hence the cache is opt-in.
+    'CATALOG_CACHE_TTL': 0,
+    # Whether the schema editor reorganizes the tables left in reorg pending
+    # state by its ALTERs once at the end instead of after every ALTER.
+    'DEFER_REORG': True,
+    # Number of connections reorganizing tables in parallel outside of
+    # transactions, 1 reorganizes them one at a time on the connection itself.
+    'REORG_WORKERS': 1,
+    # IN lists of more values are loaded into a declared global temporary
+    # table which the statement selects from instead, 0 keeps them inline.
+    # Off by default, it needs a user temporary table space and turns reads
+    # into inserts.
+    'IN_LIST_TEMP_TABLE_THRESHOLD': 0,
+    # Rows per UPDATE in which data is copied to the new column when the
+    # schema editor remakes a column, 0 copies it with one UPDATE.
+    'REMAKE_COPY_BATCH_SIZE': 0,
+    # Whether the schema editor merges consecutive column ALTERs of a table
+    # into one ALTER TABLE statement, DB2 LUW only.
+    'COALESCE_ALTERS': False,
+}
+
+schema_logger = logging.getLogger( 'django.db.backends.schema' )
+
+# Table altered by an ALTER TABLE statement, optionally qualified by its schema.
+_ALTER_TABLE_RE = re.compile( r'ALTER\s+TABLE\s+(?:("[^"]+"|[\w$#@]+)\s*\.\s*)?("[^"]+"|[\w$#@]+)', re.I )
+_REORG_PENDING_SQLSTATE = 'SQLSTATE=57016'
+# Tables checked for reorg pending state by one query.
+_REORG_CHECK_TABLES = 100
+
+# Stands for an inlined parameter inside the text of a compiled statement,
+# the digits are the original position of the parameter.
+_SLOT_TOKEN = '\x00%d\x00'
+_SLOT_RE = re.compile( '\x00(\\d+)\x00' )
+_DATE_PREFIXES = ( 'DATE', 'TIMESTAMP' )
+
+# Tokens the rewriting looks at: the markers of expression operands, i.e.
+# + %s, THEN %s, ELSE %s, %s + and %s AS, aggregate function calls, quoted
+# identifiers and literals, and parentheses. The markers in between are bound
+# unless they are inside an aggregate or hold a DECIMAL value of a SELECT or
+# UPDATE statement. THEN, ELSE and the aggregate names only count as whole
+# words: the markers of MYSUM(%s), ACCOUNT(%s) or XTHEN %s are bound, where
+# the rewriting before the tokenizer inlined them as literals. Otherwise the
+# operands are those of the earlier regular expression: %s + takes the plus
+# sign along, so of %s + %s only the first marker is inlined.
+_OPERAND_PATTERN = r'\+ *%s|(?<![\w$#@])(?:THEN|ELSE) *%s|%s(?: *\+|(?=\)? *AS))'
+_AGGREGATE_PATTERN = r'(?<![\w$#@])(?:SUM|AVG|COUNT|MIN|MAX)\s*\('
+_REWRITE_TOKEN_RE = re.compile( r"""(?P<operand>%s)|(?P<aggregate>%s)|"[^"]*"|'(?:[^'%%]|''|%%(?!s))*'|'|\(|\)""" % (
+    _OPERAND_PATTERN, _AGGREGATE_PATTERN ) )
+# Rest of a literal holding markers.
+_LITERAL_END_RE = re.compile( r"(?:[^']|'')*'" )
+# Statements without any of these have all their markers outside of contexts.
+_REWRITE_CONTEXT_RE = re.compile( '%s|%s' % ( _OPERAND_PATTERN, _AGGREGATE_PATTERN ) )
+_DECIMAL_STATEMENT_RE = re.compile( r'(SELECT|UPDATE) ' )
+_CAST_RE = re.compile( r'(?<![\w$#@])CAST\s*\(\s*$' )
+_PLUS_RE = re.compile( r'\s*\+' )
+# Bounds the text looked at in front of a marker for a CAST.
+_CAST_CONTEXT_LENGTH = 16
+
+# Whether the marker at start is the value of a CAST( %s AS ... ), whose
+# marker is typed already.
+def _is_cast_value( operation, start ):
+    return ( _CAST_RE.search( operation[max( start - _CAST_CONTEXT_LENGTH, 0 ):start].rstrip() ) is not None and
+             _PLUS_RE.match( operation, start + 2 ) is None )
+
+# IN lists of markers as the ORM writes them.
+_IN_LIST_RE = re.compile( r'(?<![\w$#@])IN \(((?:%s, )+%s)\)' )
+# Temporary tables used in turn, so a table isn't replaced while the result
+# set of an earlier statement on it is still being read.
+_IN_LIST_TABLES = 16
+_IN_LIST_COLUMNS = {
+    int: 'BIGINT',
+    float: 'DOUBLE',
+    Decimal: 'DECFLOAT(34)',
+    datetime.datetime: 'TIMESTAMP(6)',
+    datetime.date: 'DATE',
+    datetime.time: 'TIME',
+}
+# Longest VARCHAR, in bytes.
+_MAX_VARCHAR_LENGTH = 32672
+
+# Column type of the temporary table holding the values of an IN list, None
+# when they are not all of one type.
+def _in_list_column( values ):
+    kinds = set( map( type, values ) )
+    if len( kinds ) != 1:
+        return None
+    kind = kinds.pop()
+    if kind is str:
+        length = max( len( value.encode( 'utf-8' ) ) for value in values )
+        return 'VARCHAR(%d)' % max( length, 1 ) if length <= _MAX_VARCHAR_LENGTH else None
+    return _IN_LIST_COLUMNS.get( kind )
+
+# Whether the sorted positions include one from start up to end.
+def _any_between( positions, start, end ):
+    position = bisect.bisect_left( positions, start )
+    return position < len( positions ) and positions[position] < end
+
+# Parameters are classified by type only, except for strings where the
+# rewriting also depends on whether the value is a DATE/TIMESTAMP literal.
+def _parameter_signature( parameters ):
+    return tuple( ( param.__class__, param.startswith( _DATE_PREFIXES ) )
+                  if isinstance( param, str ) else param.__class__ for param in parameters )
+
+# Column types whose values are never strings, so they need no NUL stripping.
+_NON_STRING_TYPES = tuple( getattr( Database, name ) for name in
+                           ( 'NUMBER', 'BIGINT', 'FLOAT', 'DECIMAL', 'DATE', 'TIME', 'BINARY', 'BOOLEAN' )
+                           if hasattr( Database, name ) )
+
+# DB2 TIMESTAMPs are stored in UTC when time zone support is active.
+def _aware_datetime( value ):
+    if value is not None and timezone.is_naive( value ):
+        return value.replace( tzinfo=timezone.utc )
+    return value
+
+# array typecodes of the columns fetch_columns packs into arrays, along with
+# the type their values have to be of.
+_ARRAY_COLUMN_TYPES = tuple( ( getattr( Database, name ), typecode, kind ) for name, typecode, kind in
+                             ( ( 'NUMBER', 'q', int ), ( 'BIGINT', 'q', int ), ( 'FLOAT', 'd', float ) )
+                             if hasattr( Database, name ) )
+
+# Packs the values of a column into an array, or a NumPy array sharing its
+# buffer, when they are all of the type the column calls for. Other columns,
+# and columns with NULLs, stay lists.
+def _pack_column( type_code, values ):
+    for column_type, typecode, kind in _ARRAY_COLUMN_TYPES:
+        if type_code == column_type:
+            kinds = set( map( type, values ) )
+            if len( kinds ) != 1 or kinds.pop() is not kind:
+                return values
+            try:
+                packed = array( typecode, values )
+            except OverflowError:
+                return values
+            if numpy is not None:
+                return numpy.frombuffer( packed, dtype = typecode )
+            return packed
+    return values
+
+def _strip_nuls( value ):
+    if isinstance( value, str ):
+        return value.replace( '\x00', '' )
+    return value
+
+class _StatementPlan( object ):
+    """
+    Result of rewriting a format style statement to qmark style. The plan
+    holds the final SQL split around the parameters which are inlined as
+    literals, together with the positions of the parameters which are
+    passed through as markers.
+    """
+    __slots__ = ( 'segments', 'inlined', 'bound', 'adapt' )
+
+    def __init__( self, segments, inlined, bound, adapt ):
+        self.segments = segments
+        # ( position, format ) for every inlined parameter, in statement order
+        self.inlined = inlined
+        self.bound = bound
+        self.adapt = adapt
+
+    def render( self, cursor, parameters ):
+        if self.adapt:
+            adapt = cursor._adapt_parameter
+        else:
+            adapt = None
+        if not self.inlined:
+            if adapt is None:
+                return self.segments[0], tuple( parameters[index] for index in self.bound )
+            return self.segments[0], tuple( adapt( parameters[index] ) for index in self.bound )
+
+        parts = [self.segments[0]]
+        for ( index, fmt ), segment in zip( self.inlined, self.segments[1:] ):
+            value = parameters[index]
+            if fmt == 'hex':
+                value = value.obj.hex()
+            elif fmt == 'str' and adapt is not None:
+                value = adapt( value )
+            parts.append( str( value ) )
+            parts.append( segment )
+        if adapt is None:
+            bound = tuple( parameters[index] for index in self.bound )
+        else:
+            bound = tuple( adapt( parameters[index] ) for index in self.bound )
+        return ''.join( parts ), bound
     
+# ALTER TABLE statements changing a single column.
+_ALTER_COLUMN_CLAUSE_RE = re.compile( r'ALTER TABLE ((?:"[^"]+"|[\w$#@]+)(?:\.(?:"[^"]+"|[\w$#@]+))?) '
+                                      r'((?:ADD|ALTER|DROP) COLUMN ("[^"]+"|[\w$#@]+)(?:\s.*)?)$', re.S )
+_COLUMN_CLAUSE_RE = re.compile( r'(?:ADD|ALTER|DROP) COLUMN' )
+
+class AlterPlan( object ):
+    """
+    Column clauses of consecutive ALTER TABLE statements on one table, held
+    back by the cursors of the connection and run as a single ALTER TABLE
+    before any other statement. DB2 rejects a statement naming a column in
+    more than one clause, so such a clause starts a new statement. While the
+    plan is installed the catalog calls of the driver run the held-back
+    clauses first, so they never read a stale catalog.
+    """
+    _catalog_methods = ( 'tables', 'columns', 'primary_keys', 'foreign_keys', 'indexes' )
+
+    def __init__( self ):
+        self.table = None
+        self.clauses = []
+        self.parameters = []
+        self.columns = set()
+        # ( operation, parameters ) of the held-back statements
+        self.statements = []
+        self.merged = 0
+
+    # Returns ( table, clause, column ) when the statement can be merged.
+    def match( self, operation ):
+        match = _ALTER_COLUMN_CLAUSE_RE.match( operation )
+        if match is None or _COLUMN_CLAUSE_RE.search( match.group( 2 ), 1 ):
+            return None
+        return match.group( 1 ), match.group( 2 ), match.group( 3 )
+
+    def accepts( self, table, column ):
+        return not self.clauses or ( table == self.table and column not in self.columns )
+
+    def add( self, table, clause, column, operation, parameters ):
+        if self.clauses:
+            self.merged += 1
+        self.table = table
+        self.clauses.append( clause )
+        self.parameters.extend( parameters )
+        self.columns.add( column )
+        self.statements.append( ( operation, tuple( parameters ) ) )
+
+    # Returns the merged statement, its parameters and the statements it
+    # replaces, and empties the plan.
+    def take( self ):
+        operation = 'ALTER TABLE %s %s' % ( self.table, ' '.join( self.clauses ) )
+        parameters = tuple( self.parameters )
+        statements = self.statements
+        self.table = None
+        self.clauses = []
+        self.parameters = []
+        self.columns = set()
+        self.statements = []
+        return operation, parameters, statements
+
+    def install( self, connection ):
+        connection.alter_plan = self
+        for name in self._catalog_methods:
+            method = getattr( connection, name, None )
+            if method is not None:
+                setattr( connection, name, self._flushing( connection, method ) )
+
+    def uninstall( self, connection ):
+        connection.alter_plan = None
+        for name in self._catalog_methods:
+            connection.__dict__.pop( name, None )
+
+    def _flushing( self, connection, method ):
+        def call( *args, **kwargs ):
+            if self.clauses:
+                cursor = DB2CursorWrapper( connection )
+                try:
+                    cursor.flush_alter_plan()
+                finally:
+                    cursor.close()
+            return method( *args, **kwargs )
+        return call
+
+class PreparedStatementPool( object ):
+    """
+    Idle ibm_db statement handles of a connection keyed by the final SQL
+    text. A cursor checks a handle out for as long as its result set is in
+    use and gives it back on its next execute or on close, hence a handle is
+    never shared by two open cursors. Only DML statements are pooled and any
+    DDL going through the connection empties the pool.
+    """
+    _pooled_statements = ( 'SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'VALUES' )
+    _ddl_statements = ( 'ALTER', 'CREATE', 'DROP', 'RENAME', 'TRUNCATE', 'COMMENT', 'GRANT', 'REVOKE' )
+
+    def __init__( self, maxsize ):
+        self._idle = LRUCache( maxsize, on_evict = self._free )
+        self.maxsize = self._idle.maxsize
+        self.closed = False
+        self.hits = 0
+        self.misses = 0
+
+    # Statements on declared temporary tables are left out, the tables are
+    # replaced while the statements are idle.
+    def accepts( self, operation ):
+        return ( bool( self.maxsize ) and not self.closed and
+                 operation.lstrip().upper().startswith( self._pooled_statements ) and 'SESSION.' not in operation )
+
+    def invalidates( self, operation ):
+        return operation.lstrip().upper().startswith( self._ddl_statements )
+
+    def acquire( self, operation ):
+        handle = self._idle.pop( operation )
+        if handle is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return handle
+
+    def release( self, operation, handle ):
+        if self.closed or operation in self._idle:
+            self._free( operation, handle )
+            return
+        try:
+            ibm_db.free_result( handle )
+        except Exception:
+            self._free( operation, handle )
+            return
+        self._idle.put( operation, handle )
+
+    def clear( self ):
+        self._idle.clear()
+
+    def close( self ):
+        self.closed = True
+        self._idle.clear()
+
+    def info( self ):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len( self._idle ),
+            'maxsize': self.maxsize,
+        }
+
+    def _free( self, operation, handle ):
+        try:
+            ibm_db.free_stmt( handle )
+        except Exception:
+            pass
+
 class DatabaseWrapper( object ):
     # Get new database connection for non persistance connection 
     def get_new_connection(self, kwargs):
@@ -108,8 +481,13 @@ class DatabaseWrapper( object ):
         else:
             conn_options = {Database.SQL_ATTR_AUTOCOMMIT : Database.SQL_AUTOCOMMIT_OFF}
         kwargs['conn_options'] = conn_options
+        backend_options = dict( BACKEND_OPTIONS )
         if kwargsKeys.__contains__( 'options' ):
-            kwargs.update( kwargs.get( 'options' ) )
+            options = dict( kwargs.get( 'options' ) )
+            for key in BACKEND_OPTIONS:
+                if key in options:
+                    backend_options[key] = options.pop( key )
+            kwargs.update( options )
             if (ibm_db.SQL_ATTR_CURSOR_TYPE in kwargs.get('conn_options') and
                 kwargs.get('conn_options')[ibm_db.SQL_ATTR_CURSOR_TYPE] == ibm_db.SQL_CURSOR_KEYSET_DRIVEN):
                 scrollable_cursor = True
@@ -123,14 +501,39 @@ class DatabaseWrapper( object ):
             pconnect_flag = kwargs['PCONNECT']
             del kwargs['PCONNECT']
             
+        if backend_options['POOL_MAX_SIZE'] and not pconnect_flag:
+            connection = self._pooled_connection( kwargs, backend_options, scrollable_cursor )
+        else:
+            connection = self._connect( kwargs, pconnect_flag, backend_options, scrollable_cursor )
+
+        if SchemaFlag:
+            schema = connection.set_current_schema(currentschema)
+
+        return connection
+
+    def _connect( self, kwargs, pconnect_flag, backend_options, scrollable_cursor ):
         if pconnect_flag:
             connection = Database.pconnect( **kwargs )
         else:
             connection = Database.connect( **kwargs )
         connection.autocommit = connection.set_autocommit
-
-        if SchemaFlag:
-            schema = connection.set_current_schema(currentschema)
+        connection.server_profile = ServerProfile.probe( connection )
+        connection.statement_cache = LRUCache( backend_options['STATEMENT_CACHE_SIZE'] )
+        connection.prepared_statements = PreparedStatementPool( backend_options['PREPARED_STATEMENT_POOL_SIZE'] )
+        connection.executemany_chunk_size = max( int( backend_options['EXECUTEMANY_CHUNK_SIZE'] or 0 ), 0 )
+        connection.streaming_statement_options = self._streaming_statement_options( backend_options )
+        connection.strip_nuls = bool( backend_options['STRIP_NULS'] )
+        connection.connection_pool = None
+        # ( schema, table ) pairs awaiting a reorg while the schema editor
+        # defers them, None reorganizes after every ALTER.
+        connection.deferred_reorg_tables = None
+        # AlterPlan while the schema editor coalesces ALTERs.
+        connection.alter_plan = None
+        connection.reorg_workers = max( int( backend_options['REORG_WORKERS'] or 1 ), 1 )
+        # Opens the extra connections of parallel reorgs.
+        connection.reorg_connect = lambda: self._connect( kwargs, False, backend_options, False )
+        connection.in_list_threshold = max( int( backend_options['IN_LIST_TEMP_TABLE_THRESHOLD'] or 0 ), 0 )
+        connection.in_list_tables = 0
 
         if scrollable_cursor:
             # The documentation of ibm_db.connect indicates that you could pass
@@ -146,22 +549,74 @@ class DatabaseWrapper( object ):
                 {ibm_db.SQL_ATTR_CURSOR_TYPE: ibm_db.SQL_CURSOR_KEYSET_DRIVEN})
 
         return connection
+
+    # Connections are pooled per set of connection parameters and adapter options.
+    def _pooled_connection( self, kwargs, backend_options, scrollable_cursor ):
+        def connect():
+            connection = self._connect( kwargs, False, backend_options, scrollable_cursor )
+            connection.connection_pool = pool
+            return connection
+
+        key = ( repr( sorted( kwargs.items() ) ), repr( sorted( backend_options.items() ) ) )
+        pool = connection_pool.get_pool( key, connect, self._disconnect, self.is_active,
+                                         min_size = int( backend_options['POOL_MIN_SIZE'] ),
+                                         max_size = int( backend_options['POOL_MAX_SIZE'] ),
+                                         idle_timeout = backend_options['POOL_IDLE_TIMEOUT'],
+                                         max_lifetime = backend_options['POOL_MAX_LIFETIME'],
+                                         pre_ping = bool( backend_options['POOL_PRE_PING'] ),
+                                         timeout = backend_options['POOL_TIMEOUT'] )
+        return pool.acquire()
     
+    # Statement attributes of the SELECTs run by streaming cursors. The cursor is
+    # always forward-only, even when OPTIONS asks for keyset driven cursors.
+    def _streaming_statement_options( self, backend_options ):
+        options = {ibm_db.SQL_ATTR_CURSOR_TYPE: ibm_db.SQL_CURSOR_FORWARD_ONLY}
+        if backend_options['STREAMING_QUERY_PREFETCH'] and hasattr( ibm_db, 'SQL_ATTR_QUERY_PREFETCH' ):
+            options[ibm_db.SQL_ATTR_QUERY_PREFETCH] = 1
+        if backend_options['STREAMING_FETCH_BUFFER_SIZE'] and hasattr( ibm_db, 'SQL_ATTR_FET_BUF_SIZE' ):
+            options[ibm_db.SQL_ATTR_FET_BUF_SIZE] = int( backend_options['STREAMING_FETCH_BUFFER_SIZE'] )
+        return options
+
     def is_active( self, connection = None ):
         return Database.ibm_db.active(connection.conn_handler)
         
     # Over-riding _cursor method to return DB2 cursor.
     def _cursor( self, connection ):
         return DB2CursorWrapper( connection )
+
+    # Cursor for chunked reads, see DB2StreamingCursorWrapper.
+    def _streaming_cursor( self, connection ):
+        return DB2StreamingCursorWrapper( connection )
                     
+    # Pooled connections are rolled back and handed back to their pool, a
+    # connection which cannot be reset is disconnected.
     def close( self, connection ):
+        pool = getattr( connection, 'connection_pool', None )
+        if pool is None:
+            return self._disconnect( connection )
+        connection.deferred_reorg_tables = None
+        if getattr( connection, 'alter_plan', None ) is not None:
+            connection.alter_plan.uninstall( connection )
+        try:
+            connection.rollback()
+            if ( djangoVersion[0:2] >= ( 1, 6 ) ):
+                connection.set_autocommit( True )
+        except Exception:
+            pool.release( connection, discard = True )
+        else:
+            pool.release( connection )
+
+    def _disconnect( self, connection ):
+        pool = getattr( connection, 'prepared_statements', None )
+        if pool is not None:
+            pool.close()
         connection.close()
         
     def get_server_version( self, connection ):
         self.connection = connection
         if not self.connection:
             self.cursor()
-        return tuple( int( version ) for version in self.connection.server_info()[1].split( "." ) )
+        return server_profile( self.connection ).version
     
 class DB2CursorWrapper( Database.Cursor ):
         
@@ -173,6 +628,16 @@ class DB2CursorWrapper( Database.Cursor ):
     
     def __init__( self, connection ): 
         super( DB2CursorWrapper, self ).__init__( connection.conn_handler, connection )
+        # ( operation, handle ) of the statement checked out of the prepared statement pool
+        self._pooled_statement = None
+        # Row converters of the last seen description, see _row_converters
+        self._converters_description = None
+        self._converters = None
+        # Timing of the last statement and its result set for the
+        # instrumentation sinks, see ibm_db_django.instrumentation
+        self._fingerprint = None
+        self._rewrite_time = 0.0
+        self._fetch_stats = None
         
     def __iter__( self ):
         return self
@@ -186,126 +651,238 @@ class DB2CursorWrapper( Database.Cursor ):
     def _create_instance(self, connection):
         return DB2CursorWrapper(connection)
         
-    #Ex: string = 'ababababababababab', sub = 'ab', wanted = 'CD', n = 5
-    #outputs: ababababCDabababab
-    def _replacenth( self, string, sub, wanted, index, need_quote):
-        where = [m.start() for m in re.finditer(sub, string)][index]
-        before = string[:where]
-        after = string[where+2:]
-        newString = before + need_quote + str(wanted) + need_quote + after
-        return newString
-
-    def _format_parameters( self, parameters, operation, return_only_param = False):
-        select_update = False
-        if re.match(r'^(SELECT|UPDATE) ', operation):
-            select_update = True
-
-        new_parameters = []
-        parameters = list( parameters )
-        for index in range( len( parameters ) ):
-            # With raw SQL queries, datetimes can reach this function
-            # without being converted by DateTimeField.get_db_prep_value.
-            if settings.USE_TZ and isinstance( parameters[index], datetime.datetime ):
-                param = parameters[index]
-                if timezone.is_naive( param ):
-                    warnings.warn("Received a naive datetime (%s)"
-                              " while time zone support is active." % param,
-                              RuntimeWarning)
-                    default_timezone = timezone.get_default_timezone()
-                    param = timezone.make_aware( param, default_timezone )
-                param = param.astimezone(timezone.utc).replace(tzinfo=None)
-                parameters[index] = param
-
-            need_quote = ''
-            if (select_update and isinstance(parameters[index], Decimal)):
-                operation = self._replacenth(operation, '%s', parameters[index], len(new_parameters), need_quote)
-            else:
-                new_parameters.append(parameters[index])
+    # Over-riding this method to reuse the statement handles of the connection's
+    # prepared statement pool instead of preparing the statement again.
+    def _prepare_helper( self, operation, parameters = None ):
+        self._release_statement()
+        pool = getattr( self.connection, 'prepared_statements', None )
+        if pool is None or not pool.accepts( operation ):
+            if pool is not None and pool.invalidates( operation ):
+                pool.clear()
+            return super( DB2CursorWrapper, self )._prepare_helper( operation, parameters )
 
-        if return_only_param:
-            return tuple( new_parameters )
+        handle = pool.acquire( operation )
+        if handle is None:
+            super( DB2CursorWrapper, self )._prepare_helper( operation, parameters )
+            handle = self.stmt_handler
+        else:
+            try:
+                ibm_db.free_stmt( self.stmt_handler )
+            except Exception:
+                pass
+            self.stmt_handler = handle
+        self._pooled_statement = ( operation, handle )
 
-        return tuple( new_parameters ), operation
+    # A statement which failed to execute is not handed back to the pool.
+    def _execute_helper( self, parameters = None ):
+        try:
+            return super( DB2CursorWrapper, self )._execute_helper( parameters )
+        except Exception:
+            if self._pooled_statement is not None:
+                self._pooled_statement = None
+            raise
 
-    def _resolve_parameters_in_aggregator_func(self, parameters, operation):
-        op_temp = ""
-        op_temp_wParam = ""
-        p_start = 0
-        aggr_list = ['COUNT','AVG','MIN','MAX','SUM']
-        res = any(ele in operation for ele in aggr_list)
+    # Gives the statement handle checked out by this cursor back to the pool.
+    def _release_statement( self ):
+        if self._pooled_statement is None:
+            return
+        operation, handle = self._pooled_statement
+        self._pooled_statement = None
+        if self.stmt_handler is handle:
+            self.stmt_handler = None
+        pool = getattr( self.connection, 'prepared_statements', None )
+        if pool is not None:
+            pool.release( operation, handle )
 
-        if res:
-            for m in regex.finditer(r'(SUM|AVG|COUNT|MIN|MAX)\ *\(', operation):
-                end = m.end()
-                p_start = len(op_temp)
-                prev_str = operation[p_start:end-1]
-                op_temp = op_temp + prev_str
-                op_temp_wParam = op_temp_wParam + prev_str
-                next_str = operation[end-1:]
-                parm_count = op_temp_wParam.count('%s')
-                for item in regex.finditer(r'\((?>[^()]|(?R))*\)', next_str):
-                    start = item.start()
-                    end = item.end()
-                    str_wp = next_str[start:end]
-                    while (str_wp.count('%s') > 0):
-                        if(isinstance(parameters[parm_count], str) and
-                           (parameters[parm_count].find('DATE') != 0) and
-                           (parameters[parm_count].find('TIMESTAMP') != 0)):
-                            need_quote = "\'"
-                        else:
-                            need_quote = ''
-                        str_wp = self._replacenth(str_wp, '%s', parameters[parm_count], 0, need_quote)
-                        parameters = parameters[:parm_count] + parameters[(parm_count+1):]
-                    op_temp_wParam = op_temp_wParam + str_wp
-                    op_temp = op_temp + next_str[start:end]
-                    remg = end
-                    break
-
-            p_start = len(op_temp)
-            operation = op_temp_wParam + operation[p_start:]
-
-        return parameters, operation
-
-    def _resolve_parameters_in_expression_func(self, parameters, operation):
-        prev_end = 0
-        op_temp_wParam = ""
-        p_start = 0
-
-        if re.search(r'%s\ *\+|\+\ *%s|\ *THEN\ *%s|\ *\(?%s\)?\ *AS\ *|\ *ELSE\ *%s', operation):
-            for m in re.finditer(r'%s\ *\+|\+\ *%s|\ *THEN\ *%s|\ *\(?%s\)?\ *AS\ *|\ *ELSE\ *%s', operation):
-                p_start = m.start()
-                op_temp_wParam = op_temp_wParam + operation[prev_end:p_start]
-                parm_count = op_temp_wParam.count('%s')
-                end = m.end()
-                str_wp = operation[p_start:end]
-                if((isinstance(parameters[parm_count], str) and
-                   (parameters[parm_count].find('DATE') != 0) and
-                   (parameters[parm_count].find('TIMESTAMP') != 0)) or
-                    (isinstance(parameters[parm_count], datetime.date))):
-                    need_quote = "\'"
-                else:
-                    need_quote = ''
-                if(isinstance(parameters[parm_count], memoryview)):
-                    replace_string = "BX\'%s\'" % parameters[parm_count].obj.hex()
+    def close( self ):
+        self._report_fetch()
+        self._release_statement()
+        return super( DB2CursorWrapper, self ).close()
+
+    # With raw SQL queries, datetimes can reach here without being converted
+    # by DateTimeField.get_db_prep_value.
+    def _adapt_parameter( self, param ):
+        if settings.USE_TZ and isinstance( param, datetime.datetime ):
+            if timezone.is_naive( param ):
+                warnings.warn("Received a naive datetime (%s)"
+                          " while time zone support is active." % param,
+                          RuntimeWarning)
+                default_timezone = timezone.get_default_timezone()
+                param = timezone.make_aware( param, default_timezone )
+            param = param.astimezone(timezone.utc).replace(tzinfo=None)
+        return param
+
+    # Walks the statement once and decides for every %s marker whether its
+    # value is bound or inlined into the text, DB2 refusing untyped markers
+    # inside aggregate functions and in some expressions, see _REWRITE_TOKEN_RE.
+    # Returns the statement with the inlined values replaced by slot tokens.
+    def _tokenize_statement( self, operation, parameters, inlined, bound ):
+        pieces = []
+        last = 0
+        index = 0
+        # Whether each open parenthesis belongs to an aggregate function call.
+        parens = []
+        aggregates = 0
+        decimals = ()
+        if _DECIMAL_STATEMENT_RE.match( operation ):
+            decimals = [position for position, param in enumerate( parameters ) if isinstance( param, Decimal )]
+        if not _REWRITE_CONTEXT_RE.search( operation ):
+            self._rewrite_markers( operation, parameters, index, aggregates, decimals, pieces, inlined, bound )
+            return ''.join( pieces )
+        while True:
+            match = _REWRITE_TOKEN_RE.search( operation, last )
+            if match is None:
+                break
+            start = match.start()
+            index = self._rewrite_markers( operation[last:start], parameters, index, aggregates, decimals, pieces, inlined, bound )
+            last = match.end()
+            token = match.group()
+            if match.lastgroup == 'operand':
+                marker = token.rindex( '%s' )
+                if ( not aggregates and not _any_between( decimals, index, index + 1 ) and
+                     not ( marker == 0 and _is_cast_value( operation, start ) ) ):
+                    pieces.append( token[:marker] )
+                    index = self._inline_operand( parameters, index, pieces, inlined, bound )
+                    pieces.append( token[marker + 2:] )
                 else:
-                    replace_string = parameters[parm_count]
-                str_wp = self._replacenth(str_wp, '%s', replace_string, 0, need_quote)
-                parameters = parameters[:parm_count] + parameters[(parm_count+1):]
-                op_temp_wParam = op_temp_wParam + str_wp
-                prev_end = end
+                    index = self._rewrite_markers( token, parameters, index, aggregates, decimals, pieces, inlined, bound )
+                continue
+            pieces.append( token )
+            if token == "'":
+                # A literal holding markers, they are never expression operands.
+                end = _LITERAL_END_RE.match( operation, last )
+                end = end.end() if end else len( operation )
+                index = self._rewrite_markers( operation[last:end], parameters, index, aggregates, decimals, pieces, inlined, bound )
+                last = end
+            elif token == ')':
+                if parens and parens.pop():
+                    aggregates -= 1
+            elif token == '(':
+                parens.append( False )
+            elif match.lastgroup == 'aggregate':
+                parens.append( True )
+                aggregates += 1
+        self._rewrite_markers( operation[last:], parameters, index, aggregates, decimals, pieces, inlined, bound )
+        return ''.join( pieces )
+
+    # Copies text to pieces with its markers replaced, values are inlined as
+    # is inside aggregates, DECIMALs as strings and everything else is bound.
+    # Returns the index of the parameter of the next marker.
+    def _rewrite_markers( self, text, parameters, index, aggregates, decimals, pieces, inlined, bound ):
+        count = text.count( '%s' )
+        if not count:
+            pieces.append( text )
+            return index
+        end = min( index + count, len( parameters ) )
+        if not aggregates and not _any_between( decimals, index, end ):
+            pieces.append( text.replace( '%s', '?' ) )
+            bound.extend( range( index, end ) )
+            return index + count
+        parts = text.split( '%s' )
+        pieces.append( parts[0] )
+        for part in parts[1:]:
+            if index >= len( parameters ):
+                pieces.append( '?' )
+            elif aggregates:
+                param = parameters[index]
+                need_quote = "'" if isinstance( param, str ) and not param.startswith( _DATE_PREFIXES ) else ''
+                inlined[index] = 'raw'
+                pieces.append( need_quote + _SLOT_TOKEN % index + need_quote )
+            elif isinstance( parameters[index], Decimal ):
+                inlined[index] = 'str'
+                pieces.append( _SLOT_TOKEN % index )
+            else:
+                pieces.append( '?' )
+                bound.append( index )
+            pieces.append( part )
+            index += 1
+        return index
+
+    # Inlines the value of an expression operand. Returns the index of the
+    # parameter of the next marker.
+    def _inline_operand( self, parameters, index, pieces, inlined, bound ):
+        if index >= len( parameters ):
+            pieces.append( '?' )
+            return index + 1
+        param = parameters[index]
+        if isinstance( param, memoryview ):
+            inlined[index] = 'hex'
+            pieces.append( "BX'%s'" % ( _SLOT_TOKEN % index ) )
+            return index + 1
+        inlined[index] = 'str'
+        if ( isinstance( param, str ) and not param.startswith( _DATE_PREFIXES ) ) or isinstance( param, datetime.date ):
+            pieces.append( "'%s'" % ( _SLOT_TOKEN % index ) )
+        else:
+            pieces.append( _SLOT_TOKEN % index )
+        return index + 1
+
+    # Rewrites a format style statement to qmark style. The values of the
+    # parameters taking part in the rewriting only matter through their
+    # types, so the outcome is recorded as a plan which can be replayed.
+    def _compile_statement( self, operation, parameters ):
+        slots = list( range( len( parameters ) ) )
+        inlined = {}
+        adapt = False
+        if operation.count( "%s" ) > 0 and parameters:
+            adapt = True
+            slots = []
+            operation = self._tokenize_statement( operation, parameters, inlined, slots )
+
+        # Ensure SELECT statements have WITH NC and USE CURRENTLY COMMITTED to read locked records.
+        # - https://www.ibm.com/docs/en/i/7.4?topic=statement-isolation-clause
+        # - https://www.ibm.com/docs/en/i/7.4?topic=statement-concurrent-access-resolution-clause
+        # update final sql before execute so we can read locked records from iseries db
+        # sql is original generated from as_sql in SQL compilier
+        # but the generated sql may not be final, looks like it still get processed in several places
+        is_select_statement = operation.startswith('SELECT') or operation.startswith('WITH')
+        # The isolation clause is not allowed on a select from a data change statement.
+        if is_select_statement and 'FINAL TABLE (' in operation:
+            is_select_statement = False
+        # `WITH` at start also indicates it's a SELECT statement, since the WITH is the start of a CTE (Common Table Expressions), and CTEs can only be used in SELECT statements
+        if is_select_statement and ' WITH NC' not in operation:
+            operation = operation + ' WITH NC'
+        if is_select_statement and ' USE CURRENTLY COMMITTED' not in operation:
+            operation = operation + ' USE CURRENTLY COMMITTED'
 
-            operation = op_temp_wParam + operation[end:]
+        parts = _SLOT_RE.split( operation )
+        segments = tuple( parts[0::2] )
+        inlined = tuple( ( int( slot ), inlined[int( slot )] ) for slot in parts[1::2] )
+        return _StatementPlan( segments, inlined, tuple( slots ), adapt )
 
-        return parameters, operation
+    # Returns the qmark style statement and its parameters, rewriting plans are
+    # kept in the per connection statement cache.
+    def _rewrite_statement( self, operation, parameters ):
+        cache = getattr( self.connection, 'statement_cache', None )
+        if cache is None or not cache.maxsize:
+            return self._compile_statement( operation, parameters ).render( self, parameters )
+        key = ( operation, _parameter_signature( parameters ) )
+        plan = cache.get( key )
+        if plan is None:
+            plan = self._compile_statement( operation, parameters )
+            cache.put( key, plan )
+        return plan.render( self, parameters )
 
     # Over-riding this method to modify SQLs which contains format parameter to qmark. 
     def execute( self, operation, parameters = () ):
+        if not instrumentation.sinks:
+            return self._execute( operation, parameters )
+        return self._instrumented( 'execute', self._execute, operation, parameters )
+
+    def _execute( self, operation, parameters ):
         if( djangoVersion[0:2] >= (2 , 0)):
             operation = str(operation)
         try:
             if operation == "''":
                 operation = "SELECT NULL FROM SYSIBM.DUAL FETCH FIRST 0 ROW ONLY"
-            if operation.find('ALTER TABLE') == 0 and getattr(self.connection, dbms_name) != 'DB2':
+            plan = getattr( self.connection, 'alter_plan', None )
+            if plan is not None:
+                clause = plan.match( operation )
+                if clause is None or not plan.accepts( clause[0], clause[2] ):
+                    self.flush_alter_plan()
+                if clause is not None:
+                    plan.add( clause[0], clause[1], clause[2], operation, parameters or () )
+                    return True
+            if operation.find('ALTER TABLE') == 0 and not server_profile( self.connection ).is_zos:
                 doReorg = 1
             else:
                 doReorg = 0
@@ -314,39 +891,32 @@ class DB2CursorWrapper( Database.Cursor ):
                 operation = operation % parameters
                 parameters = ()
 
-            if operation.count( "%s" ) > 0 and parameters:
-                parameters, operation = self._resolve_parameters_in_aggregator_func(parameters, operation)
-                parameters, operation = self._format_parameters( parameters, operation )
-                parameters, operation = self._resolve_parameters_in_expression_func( parameters, operation )
-                if operation.count( "%s" ) > 0:
-                    operation = operation.replace("%s", "?")
-
-            # Ensure SELECT statements have WITH NC and USE CURRENTLY COMMITTED to read locked records.
-            # - https://www.ibm.com/docs/en/i/7.4?topic=statement-isolation-clause
-            # - https://www.ibm.com/docs/en/i/7.4?topic=statement-concurrent-access-resolution-clause
-            # update final sql before execute so we can read locked records from iseries db
-            # sql is original generated from as_sql in SQL compilier
-            # but the generated sql may not be final, looks like it still get processed in several places
-            is_select_statement = operation.startswith('SELECT') or operation.startswith('WITH')
-            # `WITH` at start also indicates it's a SELECT statement, since the WITH is the start of a CTE (Common Table Expressions), and CTEs can only be used in SELECT statements
-            if is_select_statement and ' WITH NC' not in operation:
-                operation = operation + ' WITH NC'
-            if is_select_statement and ' USE CURRENTLY COMMITTED' not in operation:
-                operation = operation + ' USE CURRENTLY COMMITTED'
+            if parameters is None:
+                parameters = ()
+            threshold = getattr( self.connection, 'in_list_threshold', 0 )
+            if threshold and len( parameters ) > threshold:
+                operation, parameters = self._move_in_lists( operation, parameters, threshold )
+            if instrumentation.sinks:
+                start = time.perf_counter()
+                operation, parameters = self._rewrite_statement( operation, parameters )
+                self._rewrite_time = time.perf_counter() - start
+                self._fingerprint = instrumentation.fingerprint( operation )
+            else:
+                operation, parameters = self._rewrite_statement( operation, parameters )
 
             if ( djangoVersion[0:2] <= ( 1, 1 ) ):
                 if ( doReorg == 1 ):
-                    super( DB2CursorWrapper, self ).execute( operation, parameters )
-                    return self._reorg_tables()
+                    self._execute_reorging( operation, parameters )
+                    return self._reorg_altered_table( operation )
                 else:    
-                    return super( DB2CursorWrapper, self ).execute( operation, parameters )
+                    return self._execute_reorging( operation, parameters )
             else:
                 try:
                     if ( doReorg == 1 ):
-                        super( DB2CursorWrapper, self ).execute( operation, parameters )
-                        return self._reorg_tables()
+                        self._execute_reorging( operation, parameters )
+                        return self._reorg_altered_table( operation )
                     else:    
-                        return super( DB2CursorWrapper, self ).execute( operation, parameters )
+                        return self._execute_reorging( operation, parameters )
                 except IntegrityError as e:
                     six.reraise(utils.IntegrityError, utils.IntegrityError( *tuple( six.PY3 and e.args or ( e._message, ) ) ), sys.exc_info()[2])
                     raise
@@ -363,21 +933,33 @@ class DB2CursorWrapper( Database.Cursor ):
             return None
         
     # Over-riding this method to modify SQLs which contains format parameter to qmark.
+    # Parameter sets are converted column by column and bound as arrays through
+    # ibm_db.execute_many, OPTIONS['EXECUTEMANY_CHUNK_SIZE'] sets at a time.
     def executemany( self, operation, seq_parameters ):
+        if not instrumentation.sinks:
+            return self._executemany( operation, seq_parameters )
+        return self._instrumented( 'executemany', self._executemany, operation, seq_parameters )
+
+    def _executemany( self, operation, seq_parameters ):
         try:
             if operation.count("db2regexExtraField(%s)") > 0:
                  raise ValueError("Regex not supported in this operation")
+            if getattr( self.connection, 'alter_plan', None ) is not None:
+                self.flush_alter_plan()
 
-            return_only_param = True
-            seq_parameters = [ self._format_parameters( parameters, operation, return_only_param) for parameters in seq_parameters ]
+            start = time.perf_counter()
+            seq_parameters = tuple( tuple( parameters ) for parameters in seq_parameters )
             if operation.count( "%s" ) > 0:
                 operation = operation % ( tuple( "?" * operation.count( "%s" ) ) )
+            if instrumentation.sinks:
+                self._rewrite_time = time.perf_counter() - start
+                self._fingerprint = instrumentation.fingerprint( operation )
                 
             if ( djangoVersion[0:2] <= ( 1, 1 ) ):
-                return super( DB2CursorWrapper, self ).executemany( operation, seq_parameters )
+                return self._executemany_chunks( operation, seq_parameters )
             else:
                 try:
-                    return super( DB2CursorWrapper, self ).executemany( operation, seq_parameters )
+                    return self._executemany_chunks( operation, seq_parameters )
                 except IntegrityError as e:
                     six.reraise(utils.IntegrityError, utils.IntegrityError( *tuple( six.PY3 and e.args or ( e._message, ) ) ), sys.exc_info()[2])
                     raise
@@ -388,24 +970,269 @@ class DB2CursorWrapper( Database.Cursor ):
 
         except ( IndexError, TypeError ):
             return None
+
+    def _executemany_chunks( self, operation, seq_parameters ):
+        chunk_size = getattr( self.connection, 'executemany_chunk_size', 0 ) or len( seq_parameters )
+        if len( seq_parameters ) <= chunk_size:
+            return self._executemany_chunk( operation, seq_parameters )
+        rowcount = 0
+        for start in range( 0, len( seq_parameters ), chunk_size ):
+            result = self._executemany_chunk( operation, seq_parameters[start:start + chunk_size] )
+            if self.rowcount > 0:
+                rowcount += self.rowcount
+        self._Cursor__rowcount = rowcount
+        return result
+
+    # Parameter arrays have to hold values of one type per column, sets which
+    # mix types within a column are executed one by one instead.
+    def _executemany_chunk( self, operation, seq_parameters ):
+        columns = self._format_parameter_columns( seq_parameters )
+        if columns:
+            return super( DB2CursorWrapper, self ).executemany( operation, tuple( zip( *columns ) ) )
+        if columns is not None:
+            return super( DB2CursorWrapper, self ).executemany( operation, seq_parameters )
+        rowcount = 0
+        for parameters in seq_parameters:
+            super( DB2CursorWrapper, self ).execute( operation, tuple( self._adapt_parameter( param ) for param in parameters ) )
+            if self.rowcount > 0:
+                rowcount += self.rowcount
+        self._Cursor__rowcount = rowcount
+        return True
+
+    # Returns the converted columns of the parameter sets, or None when the
+    # values of a column are not all of one type.
+    def _format_parameter_columns( self, seq_parameters ):
+        columns = []
+        for column in zip( *seq_parameters ):
+            types = set( map( type, column ) )
+            types.discard( type( None ) )
+            if len( types ) > 1:
+                return None
+            if datetime.datetime in types and settings.USE_TZ:
+                column = tuple( map( self._adapt_parameter, column ) )
+            elif memoryview in types:
+                column = tuple( param if param is None else param.tobytes() for param in column )
+            columns.append( column )
+        return columns
     
-    # table reorganization method
-    def _reorg_tables( self ):
-        checkReorgSQL = "select TABSCHEMA, TABNAME from SYSIBMADM.ADMINTABINFO where REORG_PENDING = 'Y'"
+    # Runs the ALTER TABLE clauses held back by the alter plan of the connection.
+    # When the merged statement fails, the statements it replaces run one by
+    # one, so the error names the statement which caused it rather than the
+    # one which happened to flush the plan.
+    def flush_alter_plan( self ):
+        connection = self.connection
+        plan = getattr( connection, 'alter_plan', None )
+        if plan is None or not plan.clauses:
+            return
+        operation, parameters, statements = plan.take()
+        connection.alter_plan = None
+        try:
+            if len( statements ) == 1:
+                return self._execute( operation, parameters )
+            try:
+                return self._execute( operation, parameters )
+            except Exception:
+                schema_logger.warning( "Coalesced statement failed, running its %d statements one by one: %s",
+                                       len( statements ), operation )
+            for statement, statement_parameters in statements:
+                self._execute( statement, statement_parameters )
+        finally:
+            connection.alter_plan = plan
+
+    # Replaces the IN lists of more than threshold markers by a select from a
+    # declared global temporary table loaded with their values through array
+    # binding. Lists mixing value types stay inline.
+    def _move_in_lists( self, operation, parameters, threshold ):
+        pieces = []
+        moved = []
+        last = 0
+        kept = 0
+        index = 0
+        scanned = 0
+        for match in _IN_LIST_RE.finditer( operation ):
+            start, end = match.span( 1 )
+            index += operation.count( '%s', scanned, start )
+            count = match.group( 1 ).count( '%s' )
+            column = count > threshold and _in_list_column( parameters[index:index + count] )
+            if column:
+                table = self._load_in_list( parameters[index:index + count], column )
+                if table is None:
+                    return operation, parameters
+                pieces.append( operation[last:start] )
+                pieces.append( 'SELECT V FROM %s' % table )
+                moved.extend( parameters[kept:index] )
+                kept = index + count
+                last = end
+            index += count
+            scanned = end
+        if not pieces:
+            return operation, parameters
+        pieces.append( operation[last:] )
+        moved.extend( parameters[kept:] )
+        return ''.join( pieces ), tuple( moved )
+
+    # Declares the next temporary table of the connection with a column V of
+    # type column and inserts values. Returns None, and keeps IN lists inline
+    # from then on, when the table can't be declared, e.g. for lack of a user
+    # temporary table space.
+    def _load_in_list( self, values, column ):
+        connection = self.connection
+        table = 'SESSION.DJANGO_IN_%d' % ( connection.in_list_tables % _IN_LIST_TABLES )
+        connection.in_list_tables += 1
+        try:
+            super( DB2CursorWrapper, self ).execute(
+                'DECLARE GLOBAL TEMPORARY TABLE %s ( V %s ) ON COMMIT PRESERVE ROWS NOT LOGGED WITH REPLACE' % ( table, column ) )
+        except DatabaseError:
+            connection.in_list_threshold = 0
+            return None
+        self._executemany_chunks( 'INSERT INTO %s ( V ) VALUES ( ? )' % table, tuple( ( value, ) for value in values ) )
+        return table
+
+    # Executes the statement, reorganizing the deferred tables and executing
+    # it again when it fails because one of them is in reorg pending state.
+    def _execute_reorging( self, operation, parameters ):
+        try:
+            return super( DB2CursorWrapper, self ).execute( operation, parameters )
+        except DatabaseError as e:
+            if not getattr( self.connection, 'deferred_reorg_tables', None ) or _REORG_PENDING_SQLSTATE not in str( e ):
+                raise
+        self.reorg_deferred_tables()
+        return super( DB2CursorWrapper, self ).execute( operation, parameters )
+
+    # Reorganizes the table of the ALTER TABLE statement, or records it for
+    # later while reorgs are deferred.
+    def _reorg_altered_table( self, operation ):
+        match = _ALTER_TABLE_RE.match( operation )
+        if match is None:
+            return self.reorg_tables()
+        table = tuple( name and ( name[1:-1] if name.startswith( '"' ) else name.upper() ) for name in match.groups() )
+        deferred = getattr( self.connection, 'deferred_reorg_tables', None )
+        if deferred is not None:
+            deferred[table] = None
+        else:
+            self.reorg_tables( [table] )
+
+    # Reorganizes the tables recorded while reorgs were deferred, once each.
+    def reorg_deferred_tables( self ):
+        deferred = getattr( self.connection, 'deferred_reorg_tables', None )
+        if deferred:
+            tables = list( deferred )
+            deferred.clear()
+            self.reorg_tables( tables )
+
+    # table reorganization method, checks the given ( schema, table ) pairs,
+    # a schema of None standing for the current schema, or all tables.
+    def reorg_tables( self, tables = None ):
+        if tables is None:
+            checks = [( "select TABSCHEMA, TABNAME from SYSIBMADM.ADMINTABINFO where REORG_PENDING = 'Y'", () )]
+        else:
+            checks = []
+            for start in range( 0, len( tables ), _REORG_CHECK_TABLES ):
+                selects = []
+                parameters = []
+                for schema, table in tables[start:start + _REORG_CHECK_TABLES]:
+                    selects.append( "SELECT TABSCHEMA, TABNAME FROM TABLE( SYSPROC.ADMIN_GET_TAB_INFO( %s, CAST( ? AS VARCHAR( 128 ) ) ) ) AS T WHERE REORG_PENDING = 'Y'" % (
+                        "CURRENT SCHEMA" if schema is None else "CAST( ? AS VARCHAR( 128 ) )" ) )
+                    parameters.extend( ( table, ) if schema is None else ( schema, table ) )
+                checks.append( ( " UNION ".join( selects ), tuple( parameters ) ) )
         res = []
         reorgSQLs = []
-        parameters = ()
-        super( DB2CursorWrapper, self ).execute(checkReorgSQL, parameters)
-        res = super( DB2CursorWrapper, self ).fetchall()
+        for checkReorgSQL, parameters in checks:
+            super( DB2CursorWrapper, self ).execute(checkReorgSQL, parameters)
+            res.extend( super( DB2CursorWrapper, self ).fetchall() )
         if res:
-            for sName, tName in res:
+            for sName, tName in sorted( set( map( tuple, res ) ) ):
                 reorgSQL = '''CALL SYSPROC.ADMIN_CMD('REORG TABLE "%(sName)s"."%(tName)s"')''' % {'sName': sName, 'tName': tName}
                 reorgSQLs.append(reorgSQL)
-            for sql in reorgSQLs:
-                super( DB2CursorWrapper, self ).execute(sql)
+            workers = min( getattr( self.connection, 'reorg_workers', 1 ), len( reorgSQLs ) )
+            # Other connections would wait for the locks of an open transaction.
+            if workers > 1 and ibm_db.autocommit( self.connection.conn_handler ):
+                self._reorg_in_parallel( reorgSQLs, workers )
+            else:
+                for sql in reorgSQLs:
+                    self._timed_reorg( super( DB2CursorWrapper, self ).execute, sql )
+
+    # Runs the reorgs on workers connections of their own, each taking the
+    # next statement once done with the previous one.
+    def _reorg_in_parallel( self, reorgSQLs, workers ):
+        pending = iter( reorgSQLs )
+        lock = threading.Lock()
+        def work():
+            connection = self.connection.reorg_connect()
+            try:
+                cursor = connection.cursor()
+                while True:
+                    with lock:
+                        sql = next( pending, None )
+                    if sql is None:
+                        return
+                    self._timed_reorg( cursor.execute, sql )
+            finally:
+                connection.close()
+        with ThreadPoolExecutor( max_workers = workers ) as executor:
+            futures = [executor.submit( work ) for worker in range( workers )]
+        for future in futures:
+            future.result()
+
+    def _timed_reorg( self, execute, sql ):
+        start = time.time()
+        try:
+            execute( sql )
+        finally:
+            duration = time.time() - start
+            schema_logger.debug( '(%.3f) %s', duration, sql, extra = {'duration': duration, 'sql': sql} )
     
+    # Runs execute or executemany and reports its times, the time spent
+    # beyond the rewriting counts as execute time.
+    def _instrumented( self, kind, execute, operation, parameters ):
+        self._report_fetch()
+        self._fingerprint = None
+        self._rewrite_time = 0.0
+        start = time.perf_counter()
+        try:
+            return execute( operation, parameters )
+        finally:
+            elapsed = time.perf_counter() - start
+            instrumentation.record( instrumentation.QueryEvent(
+                kind, self._fingerprint or instrumentation.fingerprint( str( operation ) ),
+                self._rewrite_time, elapsed - self._rewrite_time, 0.0, 0.0, max( self.rowcount, 0 ) ) )
+
+    # Fetch and conversion times are summed up per result set and reported
+    # once it is exhausted, the next statement runs or the cursor is closed.
+    def _instrumented_fetch( self, fetch, convert, size = None, single = False ):
+        start = time.perf_counter()
+        result = fetch()
+        fetched = time.perf_counter()
+        if single:
+            exhausted = result is None
+            rows = 0 if exhausted else 1
+            if not exhausted:
+                result = convert( result )
+        else:
+            rows = len( result )
+            result = convert( result )
+            exhausted = size is None or rows < size
+        stats = self._fetch_stats
+        if stats is None:
+            stats = self._fetch_stats = [0.0, 0.0, 0]
+        stats[0] += fetched - start
+        stats[1] += time.perf_counter() - fetched
+        stats[2] += rows
+        if exhausted:
+            self._report_fetch()
+        return result
+
+    def _report_fetch( self ):
+        stats = self._fetch_stats
+        if stats is not None:
+            self._fetch_stats = None
+            instrumentation.record( instrumentation.QueryEvent(
+                'fetch', self._fingerprint, 0.0, 0.0, stats[0], stats[1], stats[2] ) )
+
     # Over-riding this method to modify result set containing datetime and time zone support is active
     def fetchone( self ):
+        if instrumentation.sinks:
+            return self._instrumented_fetch( super( DB2CursorWrapper, self ).fetchone, self._fix_return_data, single = True )
         row = super( DB2CursorWrapper, self ).fetchone()
         if row is None:
             return row
@@ -414,32 +1241,106 @@ class DB2CursorWrapper( Database.Cursor ):
     
     # Over-riding this method to modify result set containing datetime and time zone support is active
     def fetchmany( self, size=0 ):
-        rows = super( DB2CursorWrapper, self ).fetchmany( size )
-        if rows is None:
-            return rows
-        else:
-            return [self._fix_return_data( row ) for row in rows]
+        if instrumentation.sinks:
+            return self._instrumented_fetch( lambda: super( DB2CursorWrapper, self ).fetchmany( size ),
+                                             self._fix_return_rows, size or self.arraysize )
+        return self._fix_return_rows( super( DB2CursorWrapper, self ).fetchmany( size ) )
     
     # Over-riding this method to modify result set containing datetime and time zone support is active
     def fetchall( self ):
-        rows = super( DB2CursorWrapper, self ).fetchall()
-        if rows is None:
-            return rows
-        else:
-            return [self._fix_return_data( row ) for row in rows]
+        if instrumentation.sinks:
+            return self._instrumented_fetch( super( DB2CursorWrapper, self ).fetchall, self._fix_return_rows )
+        return self._fix_return_rows( super( DB2CursorWrapper, self ).fetchall() )
+
+    # Returns the next rows of the result set as a tuple of columns, an empty
+    # tuple once it is exhausted. Integer and float columns without NULLs are
+    # arrays, NumPy arrays when NumPy is installed, the other columns lists.
+    def fetch_columns( self, size = 0 ):
+        if instrumentation.sinks:
+            return self._instrumented_fetch( lambda: super( DB2CursorWrapper, self ).fetchmany( size ),
+                                             self._fix_return_columns, size or self.arraysize )
+        return self._fix_return_columns( super( DB2CursorWrapper, self ).fetchmany( size ) )
+
+    # Converters are mapped over whole columns instead of being applied row by row.
+    def _fix_return_columns( self, rows ):
+        if not rows:
+            return ()
+        columns = list( zip( *rows ) )
+        converters = self._row_converters() or ( None, ) * len( columns )
+        description = self.description
+        for index, ( values, convert ) in enumerate( zip( columns, converters ) ):
+            if convert is not None:
+                columns[index] = list( map( convert, values ) )
+            else:
+                columns[index] = _pack_column( description[index][1], list( values ) )
+        return tuple( columns )
+
+    # Rows are converted in place instead of being copied into a second list.
+    def _fix_return_rows( self, rows ):
+        if rows:
+            converters = self._row_converters()
+            if converters is not None:
+                for index, row in enumerate( rows ):
+                    rows[index] = tuple( [value if convert is None else convert( value )
+                                          for value, convert in zip( row, converters )] )
+        return rows
         
     # This method to modify result set containing datetime and time zone support is active   
     def _fix_return_data( self, row ):
-        row = list( row )
-        index = -1
-        if ( djangoVersion[0:2] >= ( 1, 4 ) ):
-            for value, desc in zip( row, self.description ):
-                index = index + 1
-                if ( desc[1] == Database.DATETIME ):
-                    if settings.USE_TZ and value is not None and timezone.is_naive( value ):
-                        value = value.replace( tzinfo=timezone.utc )
-                        row[index] = value
-                elif ( djangoVersion[0:2] >= (1, 5 ) ):
-                    if isinstance(value, six.string_types):
-                        row[index] = re.sub(r'[\x00]', '', value)
-        return tuple( row )
+        converters = self._row_converters()
+        if converters is None:
+            return row
+        return tuple( [value if convert is None else convert( value ) for value, convert in zip( row, converters )] )
+
+    # Returns a converter, or None when the values are passed through, for each
+    # column of the current result set. The tuple is built once per description,
+    # None is returned when no column needs converting.
+    def _row_converters( self ):
+        description = self.description
+        if description is self._converters_description:
+            return self._converters
+        converters = None
+        if description and djangoVersion[0:2] >= ( 1, 4 ):
+            strip_nuls = djangoVersion[0:2] >= ( 1, 5 ) and getattr( self.connection, 'strip_nuls', True )
+            converters = []
+            for desc in description:
+                if desc[1] == Database.DATETIME:
+                    converters.append( _aware_datetime if settings.USE_TZ else None )
+                elif strip_nuls and desc[1] not in _NON_STRING_TYPES:
+                    converters.append( _strip_nuls )
+                else:
+                    converters.append( None )
+            converters = tuple( converters ) if any( converters ) else None
+        self._converters_description = description
+        self._converters = converters
+        return converters
+
+
+class DB2StreamingCursorWrapper( DB2CursorWrapper ):
+
+    """
+    Cursor returned by DatabaseWrapper.chunked_cursor() for QuerySet.iterator().
+    SELECT statements are prepared with a forward-only cursor and the block
+    fetch options of the connection, and rows are converted as they are fetched,
+    so only the current chunk of the result set is held in memory.
+    """
+
+    def _create_instance(self, connection):
+        return DB2StreamingCursorWrapper(connection)
+
+    # Streaming statements are prepared with their own statement attributes and
+    # therefore never come from the prepared statement pool.
+    def _prepare_helper( self, operation, parameters = None ):
+        options = getattr( self.connection, 'streaming_statement_options', None )
+        if not options or not ( operation.startswith( 'SELECT' ) or operation.startswith( 'WITH' ) ):
+            return super( DB2StreamingCursorWrapper, self )._prepare_helper( operation, parameters )
+        self._release_statement()
+        try:
+            ibm_db.free_stmt( self.stmt_handler )
+        except Exception:
+            pass
+        try:
+            self.stmt_handler = ibm_db.prepare( self.conn_handler, operation, options )
+        except Exception as inst:
+            self.messages.append( Database._get_exception( inst ) )
+            raise self.messages[len( self.messages ) - 1]
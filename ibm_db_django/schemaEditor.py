@@ -21,7 +21,9 @@ _IS_JYTHON = sys.platform.startswith( 'java' )
 
 import datetime
 import copy
+import logging
 import re
+from collections import OrderedDict
 
 from django.db.backends.ddl_references import (
     Columns, ForeignKeyName, IndexName, Statement, Table,
@@ -40,12 +42,52 @@ from django.db.models.fields.related import ManyToManyRel
 from django.db.utils import ProgrammingError
 from django import VERSION as djangoVersion
 
+from ibm_db_django.server import server_profile
+
 if not _IS_JYTHON:
     import ibm_db_dbi as Database
+    from ibm_db_django.pybase import AlterPlan
 else:
     from com.ziclix.python.sql import zxJDBC as Database
 Error = Database.Error
 
+logger = logging.getLogger('django.db.backends.schema')
+
+_INTEGER_KEY_TYPES = (
+    'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveSmallIntegerField',
+)
+
+# Statements whose effect on the constraints of a table the editor models.
+_NAME = r'(?:"[^"]+"|[\w$#@]+)'
+_QUALIFIED_NAME = r'%s(?:\s*\.\s*%s)?' % (_NAME, _NAME)
+_NAME_PART_RE = re.compile(r'"[^"]+"|[\w$#@]+')
+_DDL_RE = re.compile(r'\s*(CREATE|ALTER|DROP|RENAME|COMMENT)\b', re.I)
+_ALTER_TABLE_RE = re.compile(r'\s*ALTER\s+TABLE\s+(%s)\s+(.*?)\s*$' % _QUALIFIED_NAME, re.I | re.S)
+_ADD_FK_RE = re.compile(
+    r'ADD\s+CONSTRAINT\s+(%s)\s+FOREIGN\s+KEY\s*\(([^)]*)\)\s*REFERENCES\s+(%s)\s*\(([^)]*)\)$'
+    % (_NAME, _QUALIFIED_NAME), re.I | re.S)
+_DROP_CONSTRAINT_RE = re.compile(r'DROP\s+(?:CONSTRAINT|FOREIGN\s+KEY|CHECK)\s+(%s)$' % _NAME, re.I)
+_ALTER_COLUMN_RE = re.compile(r'ALTER\s+COLUMN\s', re.I)
+_ADD_COLUMN_RE = re.compile(r'ADD\s+(?:COLUMN\s+)?(?!CONSTRAINT\b|PRIMARY\b|UNIQUE\b|FOREIGN\b|CHECK\b)', re.I)
+_COLUMN_CONSTRAINT_RE = re.compile(r'\b(?:PRIMARY\s+KEY|UNIQUE|REFERENCES|CHECK|CONSTRAINT)\b', re.I)
+_CREATE_INDEX_RE = re.compile(r'\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+(%s)\s+ON\s+(%s)\s*\(([^)]*)\)\s*$'
+                              % (_QUALIFIED_NAME, _QUALIFIED_NAME), re.I | re.S)
+_DROP_INDEX_RE = re.compile(r'\s*DROP\s+INDEX\s+(%s)\s*$' % _QUALIFIED_NAME, re.I)
+
+
+# Catalog name, as introspection reports it, of a possibly qualified name.
+def _object_name(name):
+    return _NAME_PART_RE.findall(name)[-1].strip('"').lower()
+
+
+# Columns of a column list, None when it holds anything but column names.
+def _column_names(columns):
+    names = [column.strip() for column in columns.split(',')]
+    if not all(_NAME_PART_RE.match(name) and _NAME_PART_RE.match(name).group() == name for name in names):
+        return None
+    return [name.strip('"').lower() for name in names]
+
 def _is_relevant_relation(relation, altered_field):
     """
     When altering the given field, must constraints on its model from the given
@@ -70,8 +112,25 @@ def _related_non_m2m_objects(old_field, new_field):
         (obj for obj in new_field.model._meta.related_objects if _is_relevant_relation(obj, new_field))
     )
 
+def _related_tables(model):
+    """
+    Tables of the models ``model`` has foreign keys to or that have foreign
+    keys to it.
+    """
+    tables = set()
+    for field in model._meta.local_fields:
+        if field.remote_field is not None and not isinstance(field.remote_field.model, str):
+            tables.add(field.remote_field.model._meta.db_table)
+    for rel in model._meta.related_objects:
+        if not isinstance(rel.related_model, str):
+            tables.add(rel.related_model._meta.db_table)
+    return sorted(tables)
+
 class DB2SchemaEditor(BaseDatabaseSchemaEditor):
     psudo_column_prefix = 'psudo_'
+    # Constraints per lower case table name read during the session, kept up
+    # to date with the constraints the editor itself adds and drops.
+    _constraint_snapshots = None
     sql_delete_table = "DROP TABLE %(table)s"
     sql_rename_table = "RENAME TABLE %(old_table)s TO %(new_table)s"
     sql_create_column = "ALTER TABLE %(table)s ADD COLUMN %(column)s %(definition)s"
@@ -96,6 +155,180 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
         else:
             return str(value)
 
+    def __enter__(self):
+        editor = super(DB2SchemaEditor, self).__enter__()
+        self._deferred_reorg_connection = None
+        self._alter_plan_connection = None
+        self._constraint_snapshots = {}
+        options = self.connection.settings_dict.get('OPTIONS') or {}
+        if not self.collect_sql and options.get('DEFER_REORG', True):
+            self.connection.ensure_connection()
+            connection = self.connection.connection
+            if hasattr(connection, 'deferred_reorg_tables') and not server_profile(connection).is_zos:
+                connection.deferred_reorg_tables = OrderedDict()
+                self._deferred_reorg_connection = connection
+        if not self.collect_sql and options.get('COALESCE_ALTERS', False):
+            self.connection.ensure_connection()
+            connection = self.connection.connection
+            if hasattr(connection, 'alter_plan') and server_profile(connection).is_luw:
+                AlterPlan().install(connection)
+                self._alter_plan_connection = connection
+        return editor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                for sql in self.deferred_sql:
+                    self.execute(sql)
+                self.deferred_sql = []
+                if self._alter_plan_connection is not None:
+                    with self.connection.cursor() as cursor:
+                        cursor.flush_alter_plan()
+                    plan = self._alter_plan_connection.alter_plan
+                    if plan.merged:
+                        logger.debug("Merged %d ALTER TABLE statements into others.", plan.merged)
+                if self._deferred_reorg_connection is not None:
+                    with self.connection.cursor() as cursor:
+                        cursor.reorg_deferred_tables()
+            elif self._alter_plan_connection is not None:
+                self._flush_alter_plan_on_error()
+        finally:
+            self._constraint_snapshots = None
+            if self._alter_plan_connection is not None:
+                self._alter_plan_connection.alter_plan.uninstall(self._alter_plan_connection)
+                self._alter_plan_connection = None
+            if self._deferred_reorg_connection is not None:
+                self._deferred_reorg_connection.deferred_reorg_tables = None
+                self._deferred_reorg_connection = None
+        super(DB2SchemaEditor, self).__exit__(exc_type, exc_value, traceback)
+
+    def _flush_alter_plan_on_error(self):
+        """
+        Run the ALTERs still held back when an exception unwinds the editor,
+        as they would have run before it without coalescing. If they fail as
+        well, they are dropped with a warning and the original exception
+        propagates.
+        """
+        plan = self._alter_plan_connection.alter_plan
+        statements = [statement for statement, params in plan.statements]
+        if not statements:
+            return
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.flush_alter_plan()
+        except Exception:
+            logger.warning(
+                "Discarded held-back ALTER TABLE statements after an error: %s",
+                '; '.join(statements), exc_info=True,
+            )
+
+    def execute(self, sql, params=()):
+        try:
+            super(DB2SchemaEditor, self).execute(sql, params)
+        except Exception:
+            if self._constraint_snapshots is not None:
+                self._constraint_snapshots.clear()
+            raise
+        else:
+            if self._constraint_snapshots:
+                self._track_constraints(str(sql))
+        finally:
+            # Cached catalog metadata of the altered tables is stale now.
+            self.connection.introspection.invalidate_catalog_cache(str(sql))
+
+    def _get_constraints(self, table_name, model=None):
+        """
+        Return the constraints of ``table_name`` like introspection's
+        get_constraints, read from the catalog once per session. The tables
+        of the models related to ``model`` are read along with it, in one
+        query per catalog view, as altering a field looks at them next.
+        """
+        snapshots = self._constraint_snapshots
+        if snapshots is not None and table_name.lower() in snapshots:
+            return copy.deepcopy(snapshots[table_name.lower()])
+        tables = [table_name]
+        if snapshots is not None and model is not None:
+            tables.extend(table for table in _related_tables(model)
+                          if table.lower() != table_name.lower() and table.lower() not in snapshots)
+        with self.connection.cursor() as cursor:
+            if len(tables) == 1:
+                constraints = {table_name.lower(): self.connection.introspection.get_constraints(cursor, table_name)}
+            else:
+                constraints = self.connection.introspection.get_constraints_for_tables(cursor, tables)
+        if snapshots is not None:
+            for table in tables:
+                snapshots[table.lower()] = copy.deepcopy(constraints.get(table.lower(), {}))
+        return constraints.get(table_name.lower(), {})
+
+    # Applies the effect of a statement run by the editor to the snapshots, or
+    # drops the snapshots it may have changed in ways not modelled here, such
+    # as the indexes DB2 creates for primary keys and unique constraints.
+    def _track_constraints(self, sql):
+        snapshots = self._constraint_snapshots
+        match = _ALTER_TABLE_RE.match(sql)
+        if match is not None:
+            table = _object_name(match.group(1))
+            constraints = snapshots.get(table)
+            if constraints is None:
+                return
+            clause = match.group(2)
+            if _ALTER_COLUMN_RE.match(clause):
+                return
+            if _ADD_COLUMN_RE.match(clause) and not _COLUMN_CONSTRAINT_RE.search(clause):
+                return
+            fk = _ADD_FK_RE.match(clause)
+            if fk is not None:
+                columns, to_columns = _column_names(fk.group(2)), _column_names(fk.group(4))
+                if columns is not None and to_columns is not None:
+                    constraints[_object_name(fk.group(1))] = {
+                        'columns': columns,
+                        'primary_key': False,
+                        'unique': False,
+                        'foreign_key': (_object_name(fk.group(3)),) + tuple(to_columns),
+                        'check': False,
+                        'index': False,
+                    }
+                    return
+            drop = _DROP_CONSTRAINT_RE.match(clause)
+            if drop is not None:
+                name = _object_name(drop.group(1))
+                constraint = constraints.get(name)
+                if constraint is None:
+                    return
+                if constraint['foreign_key'] or constraint['check']:
+                    del constraints[name]
+                    return
+            del snapshots[table]
+            return
+        match = _CREATE_INDEX_RE.match(sql)
+        if match is not None:
+            table = _object_name(match.group(2))
+            columns = _column_names(match.group(3))
+            if table not in snapshots:
+                return
+            if columns is None:
+                del snapshots[table]
+                return
+            snapshots[table][_object_name(match.group(1))] = {
+                'columns': columns,
+                'primary_key': False,
+                'unique': False,
+                'foreign_key': None,
+                'check': False,
+                'index': True,
+                'type': 'idx',
+                'orders': ['ASC'] * len(columns),
+            }
+            return
+        match = _DROP_INDEX_RE.match(sql)
+        if match is not None:
+            name = _object_name(match.group(1))
+            for constraints in snapshots.values():
+                constraints.pop(name, None)
+            return
+        if _DDL_RE.match(sql):
+            snapshots.clear()
+
     @property
     def sql_create_pk(self):
         self._reorg_tables()
@@ -193,8 +426,7 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
         return name
 
     def get_missing_constraints(self, model, constraints_pre, deferred_constraints):
-        with self.connection.cursor() as cur:
-            constraints_post = self.connection.introspection.get_constraints(cur, model._meta.db_table)
+        constraints_post = self._get_constraints(model._meta.db_table, model)
         for constr_name, constr_dict in list(constraints_pre.items()):
             if constr_name not in constraints_post.keys():
                 if constr_dict['check'] is True:
@@ -379,9 +611,8 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
         if old_field.column != new_field.column:
             #Need to change the field name
             #Defer constraint check
-            with self.connection.cursor() as cur:
-                constraints_pre = self.connection.introspection.get_constraints(cur, model._meta.db_table)
-                self._defer_constraints_check(constraints_pre, deferred_constraints, old_field, new_field, model, defer_pk=True, defer_unique=True, defer_index=True, defer_check=True)
+            constraints_pre = self._get_constraints(model._meta.db_table, model)
+            self._defer_constraints_check(constraints_pre, deferred_constraints, old_field, new_field, model, defer_pk=True, defer_unique=True, defer_index=True, defer_check=True)
 
             self.execute(
                 self.sql_rename_column % {
@@ -525,8 +756,7 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
 
         if new_field.remote_field and new_field.db_constraint:
             name = str(self.get_fk_name(model, new_field, "_fk_%(to_table)s_%(to_column)s")).strip('\"')
-            with self.connection.cursor() as cur:
-                constraints = self.connection.introspection.get_constraints(cur, model._meta.db_table)
+            constraints = self._get_constraints(model._meta.db_table, model)
             if (name.lower() not in constraints.keys()) and not any(True for sql in self.deferred_sql if name in str(sql).strip('\"')):
                 self.execute(self._create_fk_sql(model, new_field, "_fk_%(to_table)s_%(to_column)s"))
                 if old_field.unique != new_field.unique and old_field.unique or \
@@ -553,10 +783,12 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
         if self.connection.features.connection_persists_old_columns:
             self.connection.close()
 
-    def add_field_pre(self, model, field, unique, notnull=False):
+    def add_field_pre(self, model, field, unique, notnull=False, column_exists=False):
         """
         Create a field on a model. Usually involves adding a column, but may
-        involve adding a table instead (for M2M fields).
+        involve adding a table instead (for M2M fields). With column_exists
+        the column was left by an interrupted run and only its indexes and
+        constraints are queued.
         """
         # Special-case implicit M2M tables
         if field.many_to_many and field.remote_field.through._meta.auto_created:
@@ -578,10 +810,11 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
             "definition": definition,
         }
 
-        self.execute(sql, params)
+        if not column_exists:
+            self.execute(sql, params)
         # Drop the default if we need to
         # (Django usually does not use in-database defaults)
-        if not self.skip_default(field) and self.effective_default(field) is not None:
+        if not column_exists and not self.skip_default(field) and self.effective_default(field) is not None:
             changes_sql, params = self._alter_column_default_sql(model, None, field, drop=True)
             sql = self.sql_alter_column % {
                 "table": self.quote_name(model._meta.db_table),
@@ -683,6 +916,9 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
                 except Error as e:
                     self.execute(del_column)
                     raise e
+                finally:
+                    self.connection.introspection.invalidate_catalog_cache(
+                        "ALTER TABLE %s" % model._meta.db_table.upper())
 
     def alterFieldDataTypeByRemaking(self, model, old_field, new_field, strict):
         tmp_new_field = copy.deepcopy(new_field)
@@ -695,7 +931,11 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
         tmp_new_field.primary_key = False
         unique = tmp_new_field.unique
         tmp_new_field._unique = False
-        _ , skip_post = self.add_field_pre(model, tmp_new_field, unique)
+        batch_size = self._remake_copy_batch_size(model)
+        # The column is left over from an interrupted chunked copy, which
+        # resumes with the rows not copied yet.
+        resume = bool(batch_size) and self._column_exists(model, tmp_new_field.column)
+        _ , skip_post = self.add_field_pre(model, tmp_new_field, unique, column_exists=resume)
         if skip_post:
             return
 
@@ -714,17 +954,68 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
                 new_value = "TO_TIMESTAMP(CONCAT('1900-01-01 ', %s), 'YYYY-MM-DD HH24:MI:SS.FF')" % new_value
 
         #Transfer data from old field to new tmp field
-        self.execute("UPDATE %s set %s=%s" % (
-                self.quote_name(model._meta.db_table),
-                self.quote_name(tmp_new_field.column),
-                new_value
+        if batch_size:
+            self._copy_column_in_batches(model, old_field.column, tmp_new_field.column, new_value, batch_size)
+        else:
+            self.execute("UPDATE %s set %s=%s" % (
+                    self.quote_name(model._meta.db_table),
+                    self.quote_name(tmp_new_field.column),
+                    new_value
+                )
             )
-        )
 
         self.add_field_post(model, tmp_new_field, notnull, p_key, unique)
         self.remove_field(model, old_field)
         return tmp_new_field, new_field
 
+    # Batches need an integer primary key to range over and are never used for
+    # sqlmigrate output. Inside an atomic block they could not commit on their
+    # own, so the data is copied with a single UPDATE there.
+    def _remake_copy_batch_size(self, model):
+        options = self.connection.settings_dict.get('OPTIONS') or {}
+        batch_size = int(options.get('REMAKE_COPY_BATCH_SIZE') or 0)
+        if batch_size <= 0 or self.collect_sql or model._meta.pk.get_internal_type() not in _INTEGER_KEY_TYPES:
+            return 0
+        if self.connection.in_atomic_block:
+            logger.info("Copying %s in a single UPDATE, REMAKE_COPY_BATCH_SIZE is not used inside an atomic block.",
+                        model._meta.db_table)
+            return 0
+        return batch_size
+
+    def _column_exists(self, model, column):
+        with self.connection.cursor() as cursor:
+            description = self.connection.introspection.get_table_description(cursor, model._meta.db_table)
+        return any(info.name.upper() == column.upper() for info in description)
+
+    # Copies new_value into column batch_size rows at a time, in primary key
+    # order. Every UPDATE commits on its own, so the transaction log only has
+    # to hold one batch, and rows already copied are skipped when an
+    # interrupted copy is run again. Each batch ends at the key of its last
+    # row to copy, so gaps in the keys cost nothing.
+    def _copy_column_in_batches(self, model, old_column, column, new_value, batch_size):
+        table = self.quote_name(model._meta.db_table)
+        pk = self.quote_name(model._meta.pk.column)
+        column = self.quote_name(column)
+        pending = "%s IS NULL AND %s IS NOT NULL" % (column, self.quote_name(old_column))
+        batch_end_sql = "SELECT MAX(%s) FROM (SELECT %s FROM %s WHERE %s >= %%s AND %s ORDER BY %s FETCH FIRST %d ROWS ONLY) AS BATCH" % (
+            pk, pk, table, pk, pending, pk, batch_size)
+        update_sql = "UPDATE %s SET %s = %s WHERE %s >= %%s AND %s <= %%s AND %s" % (
+            table, column, new_value, pk, pk, pending)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MIN(%s) FROM %s WHERE %s" % (pk, table, pending))
+            total, start = cursor.fetchone()
+            copied = 0
+            while start is not None:
+                cursor.execute(batch_end_sql, [start])
+                end = cursor.fetchone()[0]
+                if end is None:
+                    break
+                cursor.execute(update_sql, [start, end])
+                copied += max(cursor.rowcount, 0)
+                logger.info("Copied %d of %d rows of %s.%s to the new column (%d%%).",
+                            copied, total, model._meta.db_table, old_column, 100 * min(copied, total) // max(total, 1))
+                start = end + 1
+
     def add_field(self, model, field):
         self.__model = model
         notnull = not field.null
@@ -756,8 +1047,7 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
             return
 
         #Defer constraint check
-        with self.connection.cursor() as cur:
-            constraints_pre = self.connection.introspection.get_constraints(cur, old_db_table)
+        constraints_pre = self._get_constraints(old_db_table)
         self._defer_constraints_check(constraints_pre, deferred_constraints, old_field, new_field, model, defer_pk=True, defer_unique=True, defer_index=True, defer_check=True, defer_fk=True, rename_table=old_db_table)        
 
         self.execute(self.sql_rename_table % {
@@ -837,6 +1127,15 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
             )
        
     def _reorg_tables(self):
+        if getattr(self, '_deferred_reorg_connection', None) is not None:
+            # The cursor reorganizes the altered tables at the end, or before
+            # a statement failing on one in reorg pending state is retried.
+            return
+        if not self.collect_sql:
+            with self.connection.cursor() as cursor:
+                cursor.reorg_tables()
+            return
+        # Collected for sqlmigrate output instead of being run.
         checkReorgSQL = "select TABSCHEMA, TABNAME from SYSIBMADM.ADMINTABINFO where REORG_PENDING = 'Y'"
         res = []
         reorgSQLs = []
@@ -949,8 +1248,7 @@ class DB2SchemaEditor(BaseDatabaseSchemaEditor):
                           check=None, type_=None, exclude=None):
         """Return all constraint names matching the columns and conditions."""
 
-        with self.connection.cursor() as cursor:
-            constraints = self.connection.introspection.get_constraints(cursor, model._meta.db_table)
+        constraints = self._get_constraints(model._meta.db_table, model)
         result = []
         for name, infodict in constraints.items():
             if column_names is None or column_names == infodict['columns']:
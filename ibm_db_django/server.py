@@ -0,0 +1,105 @@
+# +--------------------------------------------------------------------------+
+# |  Licensed Materials - Property of IBM                                    |
+# |                                                                          |
+# | (C) Copyright IBM Corporation 2009-2020.                                 |
+# +--------------------------------------------------------------------------+
+# | This module complies with Django 1.0 and is                              |
+# | Licensed under the Apache License, Version 2.0 (the "License");          |
+# | you may not use this file except in compliance with the License.         |
+# | You may obtain a copy of the License at                                  |
+# | http://www.apache.org/licenses/LICENSE-2.0 Unless required by applicable |
+# | law or agreed to in writing, software distributed under the License is   |
+# | distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY |
+# | KIND, either express or implied. See the License for the specific        |
+# | language governing permissions and limitations under the License.        |
+# +--------------------------------------------------------------------------+
+
+"""
+What the DB2 server behind a connection is and supports.
+
+The driver answers ``dbms_name`` and ``server_info()`` with catalog round
+trips, so they are read once when a connection is opened and kept on it as a
+``ServerProfile``, which the rest of the backend reads through
+``server_profile(connection)``.
+"""
+
+import re
+import sys
+
+_IS_JYTHON = sys.platform.startswith('java')
+if _IS_JYTHON:
+    dbms_name, dbms_ver = 'dbname', 'dbversion'
+else:
+    dbms_name, dbms_ver = 'dbms_name', 'dbms_ver'
+
+ZOS, ISERIES, LUW = 'zos', 'iseries', 'luw'
+
+# Versions from which each platform supports a feature, None when it doesn't.
+_FEATURE_VERSIONS = {
+    # OFFSET n ROWS
+    'offset_fetch': {ZOS: (12, 1), ISERIES: (7, 1), LUW: (11, 1)},
+    'merge': {ZOS: (9, 1), ISERIES: (7, 1), LUW: (9, 1)},
+    # SELECT ... FROM FINAL TABLE ( INSERT ... )
+    'final_table': {ZOS: (8, 1), ISERIES: (7, 1), LUW: (9, 1)},
+    'boolean': {ZOS: None, ISERIES: (7, 5), LUW: (11, 1)},
+}
+_VERSION_PART_RE = re.compile(r'\d+')
+
+
+class ServerProfile(object):
+    """
+    ``name`` is the DBMS name reported by the driver, ``version`` a tuple of
+    ints and ``platform`` one of ZOS, ISERIES and LUW. ``catalog`` names the
+    schema of the catalog views: SYSIBM, QSYS2 or SYSCAT.
+    """
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+        if name == 'DB2':
+            self.platform, self.catalog = ZOS, 'SYSIBM'
+        elif name.startswith('AS'):
+            self.platform, self.catalog = ISERIES, 'QSYS2'
+        else:
+            self.platform, self.catalog = LUW, 'SYSCAT'
+        for feature, versions in _FEATURE_VERSIONS.items():
+            since = versions[self.platform]
+            setattr(self, 'supports_' + feature, since is not None and version >= since)
+
+    @property
+    def is_zos(self):
+        return self.platform == ZOS
+
+    @property
+    def is_iseries(self):
+        return self.platform == ISERIES
+
+    @property
+    def is_luw(self):
+        return self.platform == LUW
+
+    @classmethod
+    def probe(cls, connection):
+        if hasattr(connection, 'server_info'):
+            name, version = connection.server_info()[0:2]
+        else:
+            name, version = getattr(connection, dbms_name), getattr(connection, dbms_ver, '')
+        return cls(name, tuple(int(part) for part in _VERSION_PART_RE.findall(version or '')))
+
+    def __repr__(self):
+        return '<ServerProfile %s %s>' % (self.name, '.'.join(map(str, self.version)))
+
+
+def server_profile(connection):
+    """
+    Return the ``ServerProfile`` of the driver connection ``connection``,
+    probing the server only the first time.
+    """
+    profile = getattr(connection, 'server_profile', None)
+    if profile is None:
+        profile = ServerProfile.probe(connection)
+        try:
+            connection.server_profile = profile
+        except (AttributeError, TypeError):
+            pass
+    return profile